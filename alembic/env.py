@@ -25,7 +25,7 @@ from pacilfess_discord.models import metadata
 from pacilfess_discord.config import config
 
 target_metadata = metadata
-DB_URL = config.db_url
+DB_URL = config.sync_db_url
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
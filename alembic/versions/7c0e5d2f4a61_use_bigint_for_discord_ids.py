@@ -0,0 +1,56 @@
+"""Use BigInteger for Discord IDs
+
+Revision ID: 7c0e5d2f4a61
+Revises: c5b2e8a4d913
+Create Date: 2026-10-18 14:03:27.118540
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7c0e5d2f4a61"
+down_revision = "c5b2e8a4d913"
+branch_labels = None
+depends_on = None
+
+# Discord snowflakes do not fit in a 32-bit integer.
+columns = [
+    ("confessions", "server_id", False),
+    ("confessions", "message_id", False),
+    ("banned_users", "server_id", False),
+    ("violations", "server_id", False),
+    ("server_configs", "server_id", False),
+    ("server_configs", "votelog_channel", True),
+    ("server_configs", "confession_channel", True),
+]
+
+
+def upgrade():
+    # SQLite integers are already 64-bit, and it cannot alter columns.
+    if op.get_context().dialect.name == "sqlite":
+        return
+
+    for table, column, nullable in columns:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.BigInteger(),
+            existing_type=sa.Integer(),
+            existing_nullable=nullable,
+        )
+
+
+def downgrade():
+    if op.get_context().dialect.name == "sqlite":
+        return
+
+    for table, column, nullable in columns:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.Integer(),
+            existing_type=sa.BigInteger(),
+            existing_nullable=nullable,
+        )
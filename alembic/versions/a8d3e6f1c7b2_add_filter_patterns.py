@@ -0,0 +1,44 @@
+"""Add filter_patterns
+
+Revision ID: a8d3e6f1c7b2
+Revises: f2a7c4d9b1e3
+Create Date: 2026-10-18 21:08:13.572906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a8d3e6f1c7b2"
+down_revision = "f2a7c4d9b1e3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "filter_patterns",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("server_id", sa.BigInteger(), nullable=False),
+        sa.Column("pattern", sa.Text(), nullable=False),
+        sa.Column("is_regex", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["server_id"],
+            ["server_configs.server_id"],
+            name="fk_filter_patterns_server_configs_server_id_server",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "uq_filter_patterns_server_pattern",
+        "filter_patterns",
+        ["server_id", "pattern", "is_regex"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_filter_patterns_server_pattern", table_name="filter_patterns")
+    op.drop_table("filter_patterns")
@@ -0,0 +1,54 @@
+"""Add lookup indexes
+
+Revision ID: b3f1c2a9d7e4
+Revises: d55681f39187
+Create Date: 2026-10-18 10:12:41.503218
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "b3f1c2a9d7e4"
+down_revision = "d55681f39187"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Older versions could leave more than one ban row per user, keep the
+    # newest one so the unique index can be created.
+    op.execute(
+        "DELETE FROM banned_users WHERE id NOT IN "
+        "(SELECT MAX(id) FROM banned_users GROUP BY user_id, server_id)"
+    )
+
+    op.create_index(
+        "uq_confessions_server_message",
+        "confessions",
+        ["server_id", "message_id"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_confessions_server_user_sendtime",
+        "confessions",
+        ["server_id", "user_id", "sendtime"],
+    )
+    op.create_index(
+        "uq_banned_users_user_server",
+        "banned_users",
+        ["user_id", "server_id"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_violations_user_server_timestamp",
+        "violations",
+        ["user_id", "server_id", "timestamp"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_violations_user_server_timestamp", table_name="violations")
+    op.drop_index("uq_banned_users_user_server", table_name="banned_users")
+    op.drop_index("ix_confessions_server_user_sendtime", table_name="confessions")
+    op.drop_index("uq_confessions_server_message", table_name="confessions")
@@ -0,0 +1,74 @@
+"""Key stored user hashes with the secret
+
+Revision ID: c5b2e8a4d913
+Revises: b3f1c2a9d7e4
+Create Date: 2026-10-18 13:20:41.806375
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from pacilfess_discord.helper.hasher import upgrade_hash
+
+
+# revision identifiers, used by Alembic.
+revision = "c5b2e8a4d913"
+down_revision = "b3f1c2a9d7e4"
+branch_labels = None
+depends_on = None
+
+# Stays under the 999 bound parameters older SQLite versions allow, each
+# converted row takes two.
+BATCH_SIZE = 400
+
+tables = ["confessions", "banned_users", "violations"]
+
+
+def upgrade():
+    # Bans, violations, cooldowns and /delete only match on the new hashes,
+    # so this has to be done before the new version starts. Each batch is a
+    # single UPDATE committed on its own, so the database is never locked for
+    # long and an interrupted run picks up where it stopped, converted hashes
+    # are left as they are.
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        for name in tables:
+            _upgrade_table(conn, name)
+
+
+def _upgrade_table(conn, name: str):
+    table = sa.table(name, sa.column("id", sa.Integer), sa.column("user_id"))
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select([table.c.id, table.c.user_id])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        new_hashes = {}
+        for row in rows:
+            # Already keyed hashes are returned as they are.
+            new_hash = upgrade_hash(row.user_id)
+            if new_hash != row.user_id:
+                new_hashes[row.id] = new_hash
+        if new_hashes:
+            conn.execute(
+                table.update()
+                .where(table.c.id.between(rows[0].id, rows[-1].id))
+                .values(
+                    user_id=sa.case(new_hashes, value=table.c.id, else_=table.c.user_id)
+                )
+            )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    raise NotImplementedError(
+        "Keyed user hashes cannot be turned back into the old ones, "
+        "restore a backup from before this revision instead."
+    )
@@ -0,0 +1,37 @@
+"""Add channel_id to confessions
+
+Revision ID: e41a9c3b5f20
+Revises: 7c0e5d2f4a61
+Create Date: 2026-10-18 17:42:09.351288
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e41a9c3b5f20"
+down_revision = "7c0e5d2f4a61"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "confessions", sa.Column("channel_id", sa.BigInteger(), nullable=True)
+    )
+
+    # Older confessions can only be assumed to be in the current channel.
+    op.execute(
+        """
+        UPDATE confessions SET channel_id = (
+            SELECT confession_channel FROM server_configs
+            WHERE server_configs.server_id = confessions.server_id
+        )
+        WHERE channel_id IS NULL
+        """
+    )
+
+
+def downgrade():
+    op.drop_column("confessions", "channel_id")
@@ -0,0 +1,93 @@
+"""Add full-text search over confessions
+
+Revision ID: f2a7c4d9b1e3
+Revises: e41a9c3b5f20
+Create Date: 2026-10-18 19:26:51.240174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "f2a7c4d9b1e3"
+down_revision = "e41a9c3b5f20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_context().dialect.name == "sqlite":
+        # External content table, the text itself stays in confessions and
+        # the triggers keep the index in sync with it.
+        op.execute(
+            """
+            CREATE VIRTUAL TABLE confessions_fts USING fts5(
+                content,
+                content='confessions',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            """
+        )
+        op.execute(
+            """
+            CREATE TRIGGER confessions_fts_insert AFTER INSERT ON confessions
+            BEGIN
+                INSERT INTO confessions_fts(rowid, content)
+                VALUES (new.id, new.content);
+            END
+            """
+        )
+        op.execute(
+            """
+            CREATE TRIGGER confessions_fts_delete AFTER DELETE ON confessions
+            BEGIN
+                INSERT INTO confessions_fts(confessions_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+            END
+            """
+        )
+        op.execute(
+            """
+            CREATE TRIGGER confessions_fts_update AFTER UPDATE OF content
+            ON confessions
+            BEGIN
+                INSERT INTO confessions_fts(confessions_fts, rowid, content)
+                VALUES ('delete', old.id, old.content);
+                INSERT INTO confessions_fts(rowid, content)
+                VALUES (new.id, new.content);
+            END
+            """
+        )
+        op.execute("INSERT INTO confessions_fts(confessions_fts) VALUES ('rebuild')")
+        return
+
+    # Needs PostgreSQL 12 for generated columns, kept up to date by itself.
+    op.add_column(
+        "confessions",
+        sa.Column(
+            "content_tsv",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', content)", persisted=True),
+        ),
+    )
+    op.create_index(
+        "ix_confessions_content_tsv",
+        "confessions",
+        ["content_tsv"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade():
+    if op.get_context().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER confessions_fts_update")
+        op.execute("DROP TRIGGER confessions_fts_delete")
+        op.execute("DROP TRIGGER confessions_fts_insert")
+        op.execute("DROP TABLE confessions_fts")
+        return
+
+    op.drop_index("ix_confessions_content_tsv", table_name="confessions")
+    op.drop_column("confessions", "content_tsv")
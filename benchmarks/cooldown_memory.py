@@ -0,0 +1,63 @@
+"""Memory of the cooldown tracker under a stream of distinct users.
+
+Feeds 1M distinct users, one every millisecond of simulated time, through
+CooldownTracker and through the old unbounded dict, run with
+`python benchmarks/cooldown_memory.py`."""
+import os
+import sys
+import tracemalloc
+from typing import Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pacilfess_discord.helper.cooldown import CooldownTracker  # noqa: E402
+
+USERS = 1_000_000
+GUILDS = 100
+COOLDOWN = 60
+STEP = 0.001
+REPORT_EVERY = 200_000
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_tracker():
+    clock = FakeClock()
+    tracker = CooldownTracker(clock=clock)
+    for i in range(1, USERS + 1):
+        clock.now += STEP
+        tracker.hit(i % GUILDS, f"{i:064x}", COOLDOWN)
+        if i % REPORT_EVERY == 0:
+            yield i, len(tracker)
+
+
+def run_dict():
+    timestamps: Dict[int, Dict[str, float]] = {}
+    now = 0.0
+    for i in range(1, USERS + 1):
+        now += STEP
+        timestamps.setdefault(i % GUILDS, {})[f"{i:064x}"] = now
+        if i % REPORT_EVERY == 0:
+            yield i, sum(len(x) for x in timestamps.values())
+
+
+def measure(name, stream):
+    tracemalloc.start()
+    print(name)
+    for users, entries in stream:
+        current, _ = tracemalloc.get_traced_memory()
+        print(
+            f"  {users:>9} users  {entries:>9} entries  {current / 2 ** 20:>8.1f} MiB"
+        )
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    measure("CooldownTracker", run_tracker())
+    measure("Dict[int, Dict[str, float]]", run_dict())
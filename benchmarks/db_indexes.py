@@ -0,0 +1,153 @@
+"""Measures the hot lookup queries with and without the lookup indexes.
+
+Uses a throwaway SQLite database with the same schema as the migrations,
+run with `python benchmarks/db_indexes.py [rows ...]`."""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+SCHEMA = """
+CREATE TABLE confessions (
+    id INTEGER PRIMARY KEY,
+    server_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    content TEXT NOT NULL,
+    sendtime INTEGER NOT NULL,
+    attachment TEXT
+);
+CREATE TABLE banned_users (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    server_id INTEGER NOT NULL,
+    timeout INTEGER NOT NULL
+);
+CREATE TABLE violations (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    server_id INTEGER NOT NULL,
+    severity INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL
+);
+"""
+
+INDEXES = """
+CREATE UNIQUE INDEX uq_confessions_server_message ON confessions (server_id, message_id);
+CREATE INDEX ix_confessions_server_user_sendtime ON confessions (server_id, user_id, sendtime);
+CREATE UNIQUE INDEX uq_banned_users_user_server ON banned_users (user_id, server_id);
+CREATE INDEX ix_violations_user_server_timestamp ON violations (user_id, server_id, timestamp);
+"""
+
+QUERIES = {
+    "confess by message": (
+        "SELECT * FROM confessions WHERE server_id = ? AND message_id = ?",
+        lambda r: (r["server"], r["message"]),
+    ),
+    "confess by author": (
+        "SELECT * FROM confessions WHERE server_id = ? AND user_id = ? "
+        + "AND sendtime > ? ORDER BY sendtime DESC LIMIT 1",
+        lambda r: (r["server"], r["user"], r["time"] - 300),
+    ),
+    "ban by user": (
+        "SELECT * FROM banned_users WHERE user_id = ? AND server_id = ?",
+        lambda r: (r["user"], r["server"]),
+    ),
+    "violations by user": (
+        "SELECT * FROM violations WHERE user_id = ? AND server_id = ? AND timestamp >= ?",
+        lambda r: (r["user"], r["server"], r["time"] - 2419200),
+    ),
+}
+
+SERVERS = 50
+LOOKUPS = 200
+
+
+def populate(conn: sqlite3.Connection, rows: int):
+    now = int(time.time())
+    users = max(rows // 10, 1)
+
+    def confessions():
+        for i in range(rows):
+            yield (
+                i % SERVERS,
+                10 ** 17 + i,
+                f"{i % users:064x}",
+                "content",
+                now - rows + i,
+            )
+
+    def bans():
+        for i in range(rows):
+            yield (f"{i:064x}", i % SERVERS, now + 3600)
+
+    def violations():
+        for i in range(rows):
+            yield (f"{i % users:064x}", i % SERVERS, 1, now - rows + i)
+
+    conn.executemany(
+        "INSERT INTO confessions (server_id, message_id, user_id, content, sendtime) "
+        + "VALUES (?, ?, ?, ?, ?)",
+        confessions(),
+    )
+    conn.executemany(
+        "INSERT INTO banned_users (user_id, server_id, timeout) VALUES (?, ?, ?)",
+        bans(),
+    )
+    conn.executemany(
+        "INSERT INTO violations (user_id, server_id, severity, timestamp) "
+        + "VALUES (?, ?, ?, ?)",
+        violations(),
+    )
+    conn.commit()
+
+
+def measure(conn: sqlite3.Connection, rows: int):
+    rng = random.Random(rows)
+    now = int(time.time())
+    users = max(rows // 10, 1)
+    samples = []
+    for _ in range(LOOKUPS):
+        i = rng.randrange(rows)
+        samples.append(
+            {
+                "server": i % SERVERS,
+                "message": 10 ** 17 + i,
+                "user": f"{i % users:064x}",
+                "time": now,
+            }
+        )
+
+    result = {}
+    for name, (sql, params) in QUERIES.items():
+        start = time.perf_counter()
+        for sample in samples:
+            conn.execute(sql, params(sample)).fetchall()
+        result[name] = (time.perf_counter() - start) / LOOKUPS * 1000
+    return result
+
+
+def run(rows: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        conn.executescript(SCHEMA)
+        populate(conn, rows)
+
+        before = measure(conn, rows)
+        conn.executescript(INDEXES)
+        after = measure(conn, rows)
+        conn.close()
+
+    print(f"{rows} rows")
+    for name in QUERIES:
+        print(
+            f"  {name:<20} {before[name]:>9.3f} ms -> {after[name]:>7.3f} ms"
+            + f"  ({before[name] / after[name]:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    for rows in [int(x) for x in sys.argv[1:]] or [10_000, 100_000, 1_000_000]:
+        run(rows)
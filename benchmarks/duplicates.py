@@ -0,0 +1,96 @@
+"""Cost and accuracy of the near-duplicate detector.
+
+Fills one guild's window with generated confessions and times seen()
+against comparing with every fingerprint in the window. Also counts how
+many lightly edited copies are caught and how many unrelated confessions
+are flagged, run with `python benchmarks/duplicates.py [window size]`."""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pacilfess_discord.helper.similarity import (  # noqa: E402
+    DuplicateDetector,
+    simhash,
+)
+
+SYLLABLES = "ka ku sa su ma mu ta ti pe po la li na ni ra ru da di ba bi".split()
+LOOKUPS = 5000
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def vocabulary(rnd: random.Random, size: int = 3000):
+    return ["".join(rnd.choices(SYLLABLES, k=rnd.randint(1, 4))) for _ in range(size)]
+
+
+def confession(rnd: random.Random, words) -> str:
+    return " ".join(rnd.choices(words, k=rnd.randint(8, 60)))
+
+
+def edit(rnd: random.Random, words, text: str) -> str:
+    """The kind of change a raid makes to get around exact matching."""
+    kind = rnd.randrange(4)
+    if kind == 0:
+        parts = text.split()
+        parts[rnd.randrange(len(parts))] = rnd.choice(words)
+        return " ".join(parts)
+    if kind == 1:
+        return text + rnd.choice([" !!", " :)", " pls", f" #{rnd.randrange(999)}"])
+    if kind == 2:
+        return text.upper()
+    return text.replace(" ", "  ").replace("a", "@", 1)
+
+
+def main(size: int):
+    rnd = random.Random(0)
+    clock = FakeClock()
+    detector = DuplicateDetector(600, max_size=size, clock=clock)
+    words = vocabulary(rnd)
+
+    texts = [confession(rnd, words) for _ in range(size)]
+    start = time.perf_counter()
+    fingerprints = [simhash(text) for text in texts]
+    hashing = (time.perf_counter() - start) / size
+    for fingerprint in fingerprints:
+        if fingerprint is not None:
+            detector.seen(1, fingerprint)
+
+    unrelated = [simhash(confession(rnd, words)) for _ in range(LOOKUPS)]
+    window = [x for x in fingerprints if x is not None]
+
+    start = time.perf_counter()
+    flagged = sum(detector.seen(1, x) for x in unrelated if x is not None)
+    banded = (time.perf_counter() - start) / LOOKUPS
+
+    start = time.perf_counter()
+    for x in unrelated:
+        if x is not None:
+            any(bin(x ^ other).count("1") <= detector.max_distance for other in window)
+    linear = (time.perf_counter() - start) / LOOKUPS
+
+    # The lookups above pushed the originals out of the window, and seen()
+    # finds every fingerprint within max_distance, so compare directly.
+    caught = 0
+    for text in rnd.choices(texts, k=LOOKUPS):
+        distance = bin(simhash(text) ^ simhash(edit(rnd, words, text))).count("1")
+        caught += distance <= detector.max_distance
+
+    print(f"window of {size} confessions, {LOOKUPS} lookups")
+    print(f"  simhash          {hashing * 1e6:>8.1f} us per confession")
+    print(f"  seen()           {banded * 1e6:>8.1f} us per lookup")
+    print(f"  linear scan      {linear * 1e6:>8.1f} us per lookup")
+    print(f"  edited caught    {caught / LOOKUPS:>8.1%}")
+    print(f"  unrelated hit    {flagged / LOOKUPS:>8.1%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2048)
@@ -0,0 +1,205 @@
+"""Load test of /confess, /delete, vote deletion and /fessmin mute.
+
+Drives the real Fess, Admin and Config cogs through the fake gateway in
+benchmarks/simulator.py against a fresh database, and reports throughput
+and p50/p99 latency per operation. Run from anywhere with
+`python benchmarks/loadtest.py [--guilds 200 --users 5000 ...]`.
+
+Sharded deployments can be simulated by running one process per shard range
+against a shared database, e.g. `--shard-count 4 --shard-ids 0-1` and
+`--shard-count 4 --shard-ids 2-3` with the same `--database-url`."""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+import simulator
+
+Job = Callable[[], Awaitable[List[str]]]
+
+
+class PhaseResult:
+    def __init__(self, name: str, timings: List[float], errors: int, elapsed: float):
+        self.name = name
+        self.timings = sorted(timings)
+        self.errors = errors
+        self.elapsed = elapsed
+
+    def percentile(self, pct: float) -> float:
+        if not self.timings:
+            return 0.0
+        index = min(int(len(self.timings) * pct / 100), len(self.timings) - 1)
+        return self.timings[index]
+
+    def row(self) -> str:
+        count = len(self.timings)
+        rate = count / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.name:<14}{count:>8}{self.errors:>8}{rate:>10.0f}"
+            + f"{statistics.median(self.timings or [0]) * 1000:>10.2f}"
+            + f"{self.percentile(99) * 1000:>10.2f}"
+        )
+
+
+async def run_phase(name: str, jobs: List[Job], concurrency: int) -> PhaseResult:
+    queue: "asyncio.Queue[Job]" = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    timings: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            job = queue.get_nowait()
+            start = time.perf_counter()
+            replies = await job()
+            timings.append(time.perf_counter() - start)
+            if any("exception" in reply for reply in replies):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return PhaseResult(name, timings, errors, time.perf_counter() - start)
+
+
+async def configure(bot, guilds: List[simulator.FakeGuild]):
+    for guild in guilds:
+        owner = guild.owner
+        await simulator.invoke_prefix(
+            bot, guild, owner, "fessChannel", guild.confession_channel
+        )
+        await simulator.invoke_prefix(
+            bot, guild, owner, "voteLogChannel", guild.votelog_channel
+        )
+        await simulator.invoke_prefix(
+            bot, guild, owner, "addAdminRole", guild.admin_role
+        )
+
+
+def live_messages(bot, guilds: List[simulator.FakeGuild]):
+    return [
+        message
+        for guild in guilds
+        for message in guild.confession_channel.messages.values()
+        if bot.confess_index.contains(guild.id, message.id)
+    ]
+
+
+async def main(args: argparse.Namespace):
+    latency = simulator.Latency(args.latency / 1000, args.jitter / 1000)
+    guilds = [simulator.FakeGuild(latency) for _ in range(args.guilds)]
+    users = [simulator.FakeMember(simulator.next_id()) for _ in range(args.users)]
+
+    bot = simulator.create_bot(
+        guilds, shard_ids=args.shard_ids, shard_count=args.shard_count
+    )
+    # Like the real gateway, a process only gets events for its own shards.
+    guilds = [guild for guild in guilds if bot.shard_range.owns(guild.id)]
+    await bot.prepare()
+    await configure(bot, guilds)
+
+    confess = simulator.slash_command(bot, "confess")
+    delete = simulator.slash_command(bot, "delete")
+    mute = simulator.slash_command(bot, "mute", base="fessmin")
+    results = []
+
+    # /confess from random users in random guilds.
+    senders: List[Tuple[simulator.FakeGuild, simulator.FakeMember]] = []
+
+    def confess_job(guild, user, n) -> Job:
+        ctx = simulator.FakeSlashContext(bot, "confess", guild, user)
+        return lambda: simulator.invoke_slash(
+            bot, ctx, confess, confession=f"Confession number {n}."
+        )
+
+    jobs = []
+    for n in range(args.confessions):
+        guild, user = random.choice(guilds), random.choice(users)
+        senders.append((guild, user))
+        jobs.append(confess_job(guild, user, n))
+    results.append(await run_phase("confess", jobs, args.concurrency))
+
+    # /delete of the latest confession, by a share of the senders.
+    def delete_job(guild, user) -> Job:
+        ctx = simulator.FakeSlashContext(bot, "delete", guild, user)
+        return lambda: simulator.invoke_slash(bot, ctx, delete)
+
+    deleters = random.sample(senders, int(len(senders) * args.delete_ratio))
+    jobs = [delete_job(guild, user) for guild, user in deleters]
+    results.append(await run_phase("delete", jobs, args.concurrency))
+
+    # Vote deletion, every vote is timed on its own.
+    def vote_job(message, user) -> Job:
+        async def job():
+            await simulator.react(bot, message, user)
+            return []
+
+        return job
+
+    messages = live_messages(bot, guilds)
+    voted = random.sample(messages, int(len(messages) * args.vote_ratio))
+    jobs = [
+        vote_job(message, user)
+        for message in voted
+        for user in random.sample(users, args.votes)
+    ]
+    random.shuffle(jobs)
+    results.append(await run_phase("vote", jobs, args.concurrency))
+
+    # /fessmin mute by the guild admin.
+    def mute_job(message) -> Job:
+        guild = message.channel.guild
+        ctx = simulator.FakeSlashContext(bot, "mute", guild, guild.admin)
+        return lambda: simulator.invoke_slash(
+            bot, ctx, mute, message=message.jump_url, severity=random.randint(1, 3)
+        )
+
+    messages = live_messages(bot, guilds)
+    muted = random.sample(messages, int(len(messages) * args.mute_ratio))
+    jobs = [mute_job(message) for message in muted]
+    results.append(await run_phase("fessmin mute", jobs, args.concurrency))
+
+    await bot.close()
+
+    print(
+        f"{args.guilds} guilds, {args.users} users, {args.concurrency} concurrent, "
+        + f"{args.latency:g}±{args.jitter:g} ms Discord latency, {bot.shard_range}"
+    )
+    print(
+        f"{'operation':<14}{'count':>8}{'errors':>8}{'ops/s':>10}"
+        + f"{'p50 ms':>10}{'p99 ms':>10}"
+    )
+    for result in results:
+        print(result.row())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=200)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--confessions", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=50.0, help="in ms")
+    parser.add_argument("--jitter", type=float, default=20.0, help="in ms")
+    parser.add_argument("--delete-ratio", type=float, default=0.05)
+    parser.add_argument("--vote-ratio", type=float, default=0.1)
+    parser.add_argument("--votes", type=int, default=3, help="votes per message")
+    parser.add_argument("--mute-ratio", type=float, default=0.02)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--shard-count", type=int, default=None)
+    parser.add_argument(
+        "--shard-ids", default=None, help='shards of this process, e.g. "0-3"'
+    )
+    args = parser.parse_args()
+
+    simulator.setup(args.database_url, default_vote=args.votes)
+    if args.shard_ids is not None:
+        from pacilfess_discord.helper.sharding import parse_shard_ids
+
+        args.shard_ids = parse_shard_ids(args.shard_ids)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main(args))
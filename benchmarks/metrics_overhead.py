@@ -0,0 +1,56 @@
+"""Measures what recording metrics costs per call.
+
+Times a trivial coroutine with and without Histogram.timed, plus the raw
+cost of observe() and Counter.inc(), run with
+`python benchmarks/metrics_overhead.py`."""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pacilfess_discord.helper.metrics import Counter, Histogram  # noqa: E402
+
+CALLS = 200_000
+
+histogram = Histogram("bench_seconds", "Benchmark.", ["command"])
+counter = Counter("bench_total", "Benchmark.", ["reason"])
+
+
+async def handler():
+    pass
+
+
+timed_handler = histogram.timed("confess")(handler)
+
+
+async def run_calls(func):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        await func()
+    return (time.perf_counter() - start) / CALLS
+
+
+def run_sync(func):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        func()
+    return (time.perf_counter() - start) / CALLS
+
+
+async def main():
+    plain = await run_calls(handler)
+    timed = await run_calls(timed_handler)
+    observe = run_sync(lambda: histogram.observe(0.0123, "confess"))
+    inc = run_sync(lambda: counter.inc("vote"))
+
+    print(f"plain coroutine      {plain * 1e9:>7.0f} ns/call")
+    print(f"timed coroutine      {timed * 1e9:>7.0f} ns/call")
+    print(f"  overhead           {(timed - plain) * 1e9:>7.0f} ns/call")
+    print(f"Histogram.observe()  {observe * 1e9:>7.0f} ns/call")
+    print(f"Counter.inc()        {inc * 1e9:>7.0f} ns/call")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""Compares ormar with the raw queries in helper/queries.py per hot lookup.
+
+Fills a fresh, migrated database (see benchmarks/simulator.py) and times
+each lookup both ways, run with
+`python benchmarks/read_paths.py [rows] [lookups]`."""
+import asyncio
+import random
+import sys
+import time
+
+import simulator
+
+USERS = 1000
+
+
+async def fill(rows: int):
+    from pacilfess_discord.helper.database import database
+    from pacilfess_discord.models import Confess
+
+    now = int(time.time())
+    values = [
+        {
+            "server_id": 1 + i % 50,
+            "message_id": 10 ** 17 + i,
+            "channel_id": 42,
+            "user_id": f"user{i % USERS}",
+            "content": "A confession.",
+            "sendtime": now - random.randint(0, 600),
+            "attachment": None,
+        }
+        for i in range(rows)
+    ]
+    await database.execute_many(Confess.Meta.table.insert(), values)
+    return values, now - 300
+
+
+async def timed(lookups, func) -> float:
+    start = time.perf_counter()
+    for args in lookups:
+        await func(*args)
+    return (time.perf_counter() - start) / len(lookups)
+
+
+async def main(rows: int, count: int):
+    from pacilfess_discord.helper import queries
+    from pacilfess_discord.helper.database import database
+    from pacilfess_discord.models import Confess
+
+    await database.connect()
+    values, since = await fill(rows)
+    sample = random.sample(values, count)
+
+    def by_message(row):
+        return row["server_id"], row["message_id"]
+
+    def by_author(row):
+        return row["server_id"], row["user_id"]
+
+    cases = [
+        (
+            "confess exists",
+            [by_message(row) for row in sample],
+            lambda s, m: Confess.objects.get_or_none(server_id=s, message_id=m),
+            queries.confess_exists,
+        ),
+        (
+            "confess by message",
+            [by_message(row) for row in sample],
+            lambda s, m: Confess.objects.get_or_none(server_id=s, message_id=m),
+            queries.get_confess,
+        ),
+        (
+            "latest by author",
+            [by_author(row) for row in sample],
+            lambda s, u: Confess.objects.order_by("-sendtime")
+            .limit(1)
+            .get_or_none(server_id=s, user_id=u, sendtime__gt=since),
+            lambda s, u: queries.get_recent_confess(s, u, since),
+        ),
+    ]
+
+    print(f"{rows} rows, {count} lookups each")
+    print(f"{'lookup':<20}{'ormar us':>10}{'raw us':>10}{'speedup':>9}")
+    for name, lookups, orm, raw in cases:
+        # Warm up both paths first.
+        await timed(lookups[:10], orm)
+        await timed(lookups[:10], raw)
+        orm_time = await timed(lookups, orm)
+        raw_time = await timed(lookups, raw)
+        print(
+            f"{name:<20}{orm_time * 1e6:>10.1f}{raw_time * 1e6:>10.1f}"
+            + f"{orm_time / raw_time:>8.1f}x"
+        )
+
+    await database.disconnect()
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    simulator.setup()
+    asyncio.get_event_loop().run_until_complete(main(rows, count))
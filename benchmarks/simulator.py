@@ -0,0 +1,299 @@
+"""A fake Discord gateway for driving the real bot without a connection.
+
+Only the parts of discord.py and discord_slash the cogs touch are faked:
+guilds, channels, messages, reactions, slash and prefix contexts, and raw
+reaction events. Every fake REST call sleeps for the configured latency.
+
+`setup()` must be called before anything from pacilfess_discord is imported,
+it writes a config.json pointing at a fresh database and migrates it."""
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import discord
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+_ids = itertools.count(10 ** 6)
+
+
+def next_id() -> int:
+    """Snowflake-like IDs, so guilds spread over shards like real ones."""
+    return next(_ids) << 22 | random.getrandbits(22)
+
+
+def setup(database_url: Optional[str] = None, **options: Any) -> str:
+    """Creates a working directory with a config.json and a migrated database.
+
+    Returns the directory, which is also made the current working directory
+    since the config is read from there on import."""
+    workdir = tempfile.mkdtemp(prefix="pacilfess-sim-")
+    conf = {
+        "token": "",
+        "default_vote": 3,
+        "secret": "simulator",
+        "db_path": os.path.join(workdir, "fess.db"),
+        "log_level": "WARNING",
+        **options,
+    }
+    if database_url:
+        conf["database_url"] = database_url
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump(conf, f)
+    os.chdir(workdir)
+
+    from alembic import command
+    from alembic.config import Config as AlembicConfig
+
+    alembic_cfg = AlembicConfig(os.path.join(ROOT, "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    command.upgrade(alembic_cfg, "head")
+    return workdir
+
+
+class Latency:
+    def __init__(self, mean: float = 0.0, jitter: float = 0.0):
+        self.mean = mean
+        self.jitter = jitter
+
+    async def wait(self):
+        delay = self.mean + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+        self.mention = f"<@&{role_id}>"
+
+
+class FakeMember:
+    def __init__(self, user_id: int, roles: Optional[List[FakeRole]] = None):
+        self.id = user_id
+        self.roles = roles or []
+        self.mention = f"<@{user_id}>"
+
+
+class FakeReaction:
+    def __init__(self, emoji: str):
+        self.emoji = emoji
+        self.count = 0
+        self.me = False
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel", embed: Any = None):
+        self.id = next_id()
+        self.channel = channel
+        self.embed = embed
+        self.reactions: List[FakeReaction] = []
+
+    @property
+    def jump_url(self) -> str:
+        guild_id = self.channel.guild.id
+        return f"https://discord.com/channels/{guild_id}/{self.channel.id}/{self.id}"
+
+    def _reaction(self, emoji: str) -> FakeReaction:
+        for reaction in self.reactions:
+            if reaction.emoji == emoji:
+                return reaction
+        reaction = FakeReaction(emoji)
+        self.reactions.append(reaction)
+        return reaction
+
+    def react(self, emoji: str):
+        """A user reacting, which costs the bot nothing."""
+        self._reaction(emoji).count += 1
+
+    def unreact(self, emoji: str):
+        reaction = self._reaction(emoji)
+        reaction.count = max(reaction.count - 1, 0)
+
+    async def add_reaction(self, emoji: str):
+        await self.channel.latency.wait()
+        reaction = self._reaction(emoji)
+        if not reaction.me:
+            reaction.me = True
+            reaction.count += 1
+
+    async def edit(self, **fields: Any):
+        await self.channel.latency.wait()
+        self.embed = fields.get("embed", self.embed)
+
+
+class FakeChannel:
+    def __init__(self, guild: "FakeGuild", latency: Latency):
+        self.id = next_id()
+        self.guild = guild
+        self.latency = latency
+        self.mention = f"<#{self.id}>"
+        self.messages: Dict[int, FakeMessage] = {}
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> FakeMessage:
+        await self.latency.wait()
+        message = FakeMessage(self, kwargs.get("embed"))
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await self.latency.wait()
+        return self.messages[message_id]
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return self.messages[message_id]
+
+
+class FakeGuild(discord.Guild):
+    """Subclasses discord.Guild only to pass the cogs' isinstance checks,
+    Guild.__init__ is never called."""
+
+    # Plain attributes here, properties on Guild.
+    owner = None
+    channels = None
+
+    def __init__(self, latency: Latency):
+        self.id = next_id()
+        self.owner = FakeMember(next_id())
+        self.owner_id = self.owner.id
+        self.admin_role = FakeRole(next_id())
+        self.admin = FakeMember(next_id(), [self.admin_role])
+        self.confession_channel = FakeChannel(self, latency)
+        self.votelog_channel = FakeChannel(self, latency)
+        self.channels = {
+            c.id: c for c in (self.confession_channel, self.votelog_channel)
+        }
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channels.get(channel_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self.admin_role if role_id == self.admin_role.id else None
+
+
+class FakeSlashContext:
+    """Stands in for discord_slash.SlashContext, keeps the replies sent."""
+
+    def __init__(self, bot: Any, name: str, guild: FakeGuild, author: FakeMember):
+        self.bot = bot
+        self.name = name
+        self.guild = guild
+        self.guild_id = guild.id
+        self.author = author
+        self.channel = guild.confession_channel
+        self.replies: List[str] = []
+        self.latency = guild.confession_channel.latency
+
+    async def defer(self, hidden: bool = False):
+        await self.latency.wait()
+
+    async def send(self, content: str = "", **kwargs: Any):
+        await self.latency.wait()
+        self.replies.append(content)
+
+
+class FakeCommandContext:
+    """Stands in for discord.ext.commands.Context for the Config cog."""
+
+    def __init__(self, bot: Any, command: Any, guild: FakeGuild, author: FakeMember):
+        self.bot = bot
+        self.command = command
+        self.guild = guild
+        self.author = author
+        self.replies: List[str] = []
+        self.latency = guild.confession_channel.latency
+
+    async def send(self, content: str = "", **kwargs: Any):
+        await self.latency.wait()
+        self.replies.append(content)
+
+
+class FakeReactionEvent:
+    """Same attributes as discord.RawReactionActionEvent."""
+
+    def __init__(self, message: FakeMessage, user: FakeMember, emoji: Any):
+        self.emoji = emoji
+        self.guild_id = message.channel.guild.id
+        self.channel_id = message.channel.id
+        self.message_id = message.id
+        self.user_id = user.id
+        self.member = user
+
+
+def create_bot(guilds: List[FakeGuild], **kwargs: Any):
+    """Builds the real bot, with its channel lookups served by `guilds`.
+
+    Extra arguments go to the bot, e.g. shard_ids and shard_count."""
+    from pacilfess_discord.bot import Fess
+
+    class SimulatedFess(Fess):
+        def __init__(self, *args: Any, **kwargs: Any):
+            super().__init__(*args, **kwargs)
+            self.sim_user = FakeMember(next_id())
+            self.sim_channels = {
+                channel.id: channel
+                for guild in guilds
+                for channel in guild.channels.values()
+            }
+
+        @property
+        def user(self):
+            return self.sim_user
+
+        def get_channel(self, id: int):
+            return self.sim_channels.get(id)
+
+    return SimulatedFess(
+        command_prefix="p!",
+        intents=discord.Intents.default(),
+        sync_commands=False,
+        **kwargs,
+    )
+
+
+def slash_command(bot: Any, name: str, base: Optional[str] = None):
+    if base:
+        return bot.slash.subcommands[base][name]
+    return bot.slash.commands[name]
+
+
+async def invoke_slash(
+    bot: Any, ctx: FakeSlashContext, command: Any, **options: Any
+) -> List[str]:
+    """Runs a slash command the way discord_slash does, errors included."""
+    try:
+        await command.invoke(ctx, **options)
+    except Exception as exc:
+        await bot.on_slash_command_error(ctx, exc)
+    return ctx.replies
+
+
+async def invoke_prefix(
+    bot: Any, guild: FakeGuild, author: FakeMember, name: str, *args: Any
+) -> List[str]:
+    """Runs a p! command with already converted arguments."""
+    from discord.utils import maybe_coroutine
+
+    command = bot.get_command(name)
+    ctx = FakeCommandContext(bot, command, guild, author)
+    for check in command.checks:
+        if not await maybe_coroutine(check, ctx):
+            return ctx.replies
+
+    await command.cog.cog_before_invoke(ctx)
+    await command.callback(command.cog, ctx, *args)
+    await command.cog.cog_after_invoke(ctx)
+    return ctx.replies
+
+
+async def react(bot: Any, message: FakeMessage, user: FakeMember, emoji: str = "❌"):
+    """A user adds a reaction and the gateway delivers the raw event."""
+    message.react(emoji)
+    event = FakeReactionEvent(message, user, discord.PartialEmoji(name=emoji))
+    await bot.on_raw_reaction_add(event)
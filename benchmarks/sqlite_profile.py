@@ -0,0 +1,138 @@
+"""Compares SQLite defaults with the tuned profile under concurrent load.
+
+Drives the bot's own database code on a database migrated by
+benchmarks/simulator.py: confessions are saved through helper.writer, and
+votes look their confession up with helper.queries.get_confess, the query
+vote deletion runs, while the saves are going on. The default profile has
+sqlite_tuning off and writes in place, like before DatabaseWriter, the tuned
+one uses the PRAGMAs from helper.database and a started writer. The config
+is read on import, so each profile runs in a process of its own. Run with
+`python benchmarks/sqlite_profile.py [--confessions 3000 ...]`."""
+import argparse
+import asyncio
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+import simulator
+
+PROFILES = ["default", "tuned"]
+GUILDS = 10
+
+
+def row(name: str, timings: List[float], errors: int, elapsed: float) -> str:
+    def pct(p: int) -> float:
+        if len(timings) < 2:
+            return 0.0
+        return statistics.quantiles(timings, n=100)[p - 1] * 1000
+
+    return (
+        f"{name:<14}{len(timings):>8}{errors:>8}{len(timings) / elapsed:>10.0f}"
+        + f"{pct(50):>10.2f}{pct(99):>10.2f}"
+    )
+
+
+async def main(args: argparse.Namespace):
+    from pacilfess_discord.helper.database import database
+    from pacilfess_discord.helper.queries import get_confess
+    from pacilfess_discord.helper.writer import writer
+    from pacilfess_discord.models import Confess
+
+    await database.connect()
+    if args.profile == "tuned":
+        writer.start()
+
+    numbers = iter(range(args.confessions))
+    sent: List[Tuple[int, int]] = []
+    confess_timings: List[float] = []
+    vote_timings: List[float] = []
+    confess_errors = vote_errors = 0
+    done = asyncio.Event()
+
+    async def confess_worker():
+        nonlocal confess_errors
+        # Shared by all workers, so every number is sent once.
+        for n in numbers:
+            confess = Confess(
+                server_id=n % GUILDS,
+                message_id=n,
+                channel_id=1,
+                user_id=f"{n:048x}",
+                content="x" * 200,
+                sendtime=int(time.time()),
+            )
+            start = time.perf_counter()
+            try:
+                await writer.submit(confess.save)
+            except Exception:
+                confess_errors += 1
+                continue
+            confess_timings.append(time.perf_counter() - start)
+            sent.append((confess.server_id, confess.message_id))
+
+    async def vote(server_id: int, message_id: int):
+        nonlocal vote_errors
+        start = time.perf_counter()
+        try:
+            await get_confess(server_id, message_id)
+        except Exception:
+            vote_errors += 1
+            return
+        vote_timings.append(time.perf_counter() - start)
+
+    async def vote_load():
+        # Arrive at a fixed rate, each in a task of its own like gateway
+        # events, so both profiles get the same load however fast they are.
+        votes = []
+        interval = 1 / args.vote_rate
+        next_at = time.perf_counter()
+        while not done.is_set():
+            if sent:
+                votes.append(asyncio.ensure_future(vote(*random.choice(sent))))
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        await asyncio.gather(*votes)
+
+    start = time.perf_counter()
+    voting = asyncio.ensure_future(vote_load())
+    await asyncio.gather(*(confess_worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await voting
+
+    await writer.stop()
+    await database.disconnect()
+
+    print(
+        f"{args.profile}: {args.concurrency} confessing tasks, "
+        + f"{args.vote_rate:g} votes/s"
+    )
+    print(
+        f"{'operation':<14}{'count':>8}{'errors':>8}{'ops/s':>10}"
+        + f"{'p50 ms':>10}{'p99 ms':>10}"
+    )
+    print(row("confess", confess_timings, confess_errors, elapsed))
+    print(row("vote", vote_timings, vote_errors, elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--confessions", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--vote-rate", type=float, default=200.0, help="per second")
+    parser.add_argument("--profile", choices=PROFILES, default=None)
+    args = parser.parse_args()
+
+    if args.profile is None:
+        for profile in PROFILES:
+            subprocess.run(
+                [sys.executable, __file__, "--profile", profile] + sys.argv[1:],
+                check=True,
+            )
+    else:
+        simulator.setup(sqlite_tuning=args.profile == "tuned")
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(main(args))
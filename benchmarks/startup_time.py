@@ -0,0 +1,46 @@
+"""Measures how long `import pacilfess_discord.bot` takes in a fresh process.
+
+Needs the bot's dependencies and a config.json in the working directory,
+run with `python benchmarks/startup_time.py [runs]` from the repository root.
+The key derivation is timed separately, since it no longer runs on import."""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def time_import(runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", "import pacilfess_discord.bot"],
+            cwd=os.getcwd(),
+            env={**os.environ, "PYTHONPATH": ROOT},
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_derive_key():
+    sys.path.insert(0, ROOT)
+    from pacilfess_discord.helper.hasher import derive_key
+
+    start = time.perf_counter()
+    derive_key()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    timings = time_import(runs)
+    print(f"import pacilfess_discord.bot over {runs} runs")
+    print(f"  median {statistics.median(timings) * 1000:.0f} ms")
+    print(f"  min    {min(timings) * 1000:.0f} ms")
+    print(
+        f"derive_key() {time_derive_key() * 1000:.0f} ms (now lazy, off the event loop)"
+    )
@@ -0,0 +1,96 @@
+"""Word filter throughput at 10k entries.
+
+Compiles 10k generated terms plus some regex patterns into a WordFilter
+and times a search per confession against one re.search per entry and
+against one plain alternation of every entry, run with
+`python benchmarks/word_filter.py [terms] [patterns]`. Before that it
+checks that patterns with catastrophic backtracking are refused, and
+skipped when they were stored before."""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pacilfess_discord.helper.word_filter import (  # noqa: E402
+    WordFilter,
+    validate_pattern,
+)
+
+SYLLABLES = "ka ku sa su ma mu ta ti pe po la li na ni ra ru da di ba bi".split()
+MESSAGES = 200
+
+# Each takes seconds or more on EVIL_TEXT with a plain re.search.
+PATHOLOGICAL = [r"(a+)+$", r"(a|a)+$", r"(?:a?a?)+$", r"(\w+\s?)+$", r"(?:a+){3,}$"]
+EVIL_TEXT = "a" * 26 + "!"
+
+
+def word(rnd: random.Random) -> str:
+    return "".join(rnd.choices(SYLLABLES, k=rnd.randint(2, 5)))
+
+
+def timed(func, messages) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        func(message)
+    return (time.perf_counter() - start) / len(messages)
+
+
+def check_backtracking():
+    for pattern in PATHOLOGICAL + [r"(\w+)\1"]:
+        assert validate_pattern(pattern), pattern
+
+    # As if they were stored before validate_pattern() refused them.
+    word_filter = WordFilter(["kasar"], PATHOLOGICAL + ["a{26}!"])
+    start = time.perf_counter()
+    assert word_filter.search(EVIL_TEXT) == EVIL_TEXT
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.01, elapsed
+    print(f"{len(PATHOLOGICAL)} pathological patterns refused and skipped")
+
+
+def main(term_count: int, pattern_count: int):
+    check_backtracking()
+
+    rnd = random.Random(0)
+    terms = list({word(rnd) for _ in range(term_count * 2)})[:term_count]
+    patterns = [f"{word(rnd)}[0-9]+{word(rnd)}" for _ in range(pattern_count)]
+    blocked = set(terms)
+    # Clean messages, the common case and the slowest, nothing stops early.
+    messages = []
+    for _ in range(MESSAGES):
+        words = (word(rnd) for _ in range(rnd.randint(20, 200)))
+        messages.append(" ".join(x for x in words if x not in blocked))
+
+    start = time.perf_counter()
+    word_filter = WordFilter(terms, patterns)
+    compiling = time.perf_counter() - start
+
+    compiled = [re.compile(rf"\b{re.escape(x)}\b") for x in terms]
+    compiled += [re.compile(x) for x in patterns]
+    alternation = re.compile(
+        "|".join([rf"\b{re.escape(x)}\b" for x in terms] + patterns)
+    )
+
+    def each(message: str):
+        return any(x.search(message) for x in compiled)
+
+    average = sum(len(x) for x in messages) / len(messages)
+    print(f"{len(terms)} terms, {len(patterns)} patterns, {average:.0f} chars")
+    print(f"  WordFilter compile   {compiling * 1e3:>9.1f} ms")
+    for name, func, sample in [
+        ("WordFilter.search", word_filter.search, messages),
+        ("one alternation", alternation.search, messages),
+        # Far too slow to run on all of them.
+        ("re.search per entry", each, messages[:20]),
+    ]:
+        print(f"  {name:<20} {timed(func, sample) * 1e6:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    )
@@ -1,29 +1,48 @@
+import logging
 import sys
 import traceback
 from datetime import datetime, timedelta
-from typing import Optional, Union, cast
+from typing import Optional, Tuple, Union, cast
 
+import aiohttp
 import discord
 from discord.channel import TextChannel
 from discord.ext import commands
-from discord.ext.commands import Bot, Context
+from discord.ext.commands import AutoShardedBot, Context
 from discord.raw_models import RawReactionActionEvent
 from discord.reaction import Reaction
 from discord_slash import SlashCommand
 from discord_slash.context import SlashContext
 
 from pacilfess_discord.config import config
+from pacilfess_discord.helper.bans import BanManager
+from pacilfess_discord.helper.config_cache import ConfigCache
+from pacilfess_discord.helper.confess_index import ConfessionIndex
+from pacilfess_discord.helper.confess_queue import ConfessionQueue
 from pacilfess_discord.helper.database import database
 from pacilfess_discord.helper.embed import create_embed
+from pacilfess_discord.helper.filter_cache import FilterCache
 from pacilfess_discord.helper.hasher import enc_data, hash_user
-from pacilfess_discord.helper.utils import Forbidden, NoConfig, check_banned
-from pacilfess_discord.models import (
-    BannedUser,
-    Confess,
-    DeletedData,
-    ServerConfig,
-    Violation,
+from pacilfess_discord.helper.metrics import (
+    deletions_total,
+    discord_request_seconds,
+    event_seconds,
+    mutes_total,
+    registry,
+    votes_total,
 )
+from pacilfess_discord.helper.metrics_server import MetricsServer
+from pacilfess_discord.helper.queries import AnyConfess, get_confess
+from pacilfess_discord.helper.scheduler import Priority, RequestScheduler
+from pacilfess_discord.helper.sharding import ShardRange
+from pacilfess_discord.helper.similarity import DuplicateDetector
+from pacilfess_discord.helper.state import LocalStateStore, create_state_store
+from pacilfess_discord.helper.ttl_cache import TTLCache
+from pacilfess_discord.helper.utils import Forbidden, NoConfig
+from pacilfess_discord.helper.violations import ViolationScores
+from pacilfess_discord.helper.votes import VoteCounter
+from pacilfess_discord.helper.writer import writer
+from pacilfess_discord.models import DeletedData
 
 cogs = [
     "pacilfess_discord.cogs.Fess",
@@ -32,11 +51,41 @@ cogs = [
 ]
 
 
-class Fess(Bot):
-    def __init__(self, *args, **kwargs):
+class Fess(AutoShardedBot):
+    def __init__(self, *args, sync_commands: bool = True, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.slash = SlashCommand(self, sync_commands=True)
+        # All in-memory state below is keyed by guild and only loaded for
+        # the guilds of this process' shards.
+        self.shard_range = ShardRange(
+            kwargs.get("shard_ids"), kwargs.get("shard_count")
+        )
+
+        self.config_cache = ConfigCache()
+        self.filters = FilterCache()
+        self.confess_index = ConfessionIndex()
+        self.confessions = ConfessionQueue()
+        self.state = create_state_store()
+        self.votes = VoteCounter(self.state)
+        # Recently deleted confessions, reactions on them are dropped at once.
+        self.tombstones: TTLCache[Tuple[int, int], bool] = TTLCache(4096, 3600)
+        self.violations = ViolationScores()
+        self.bans = BanManager(self.state, config.ban_sweep_interval)
+        self.duplicates = DuplicateDetector(
+            config.duplicate_window,
+            config.duplicate_distance,
+            config.duplicate_window_size,
+        )
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self.outbound = RequestScheduler(config.outbound_concurrency)
+        self.metrics_server: Optional[MetricsServer] = None
+        if config.metrics_port:
+            self.metrics_server = MetricsServer(
+                config.metrics_host, config.metrics_port
+            )
+        self._setup_metrics()
+
+        self.slash = SlashCommand(self, sync_commands=sync_commands)
         for cog in cogs:
             try:
                 self.load_extension(cog)
@@ -47,7 +96,109 @@ class Fess(Bot):
                     )
                 )
 
-    async def on_vote_delete(self, confess: Confess):
+    def _setup_metrics(self):
+        request = self.http.request
+
+        async def timed_request(route, **kwargs):
+            with discord_request_seconds.time(route.method, route.path):
+                return await request(route, **kwargs)
+
+        self.http.request = timed_request  # type: ignore
+
+        registry.gauge(
+            "pacilfess_config_cache_hits",
+            "Server config lookups served from memory.",
+            lambda: self.config_cache.hits,
+        )
+        registry.gauge(
+            "pacilfess_config_cache_misses",
+            "Server config lookups that went to the database.",
+            lambda: self.config_cache.misses,
+        )
+        registry.gauge(
+            "pacilfess_pending_confessions",
+            "Confessions not written to the database yet.",
+            lambda: len(self.confessions),
+        )
+        registry.gauge(
+            "pacilfess_discord_queue_depth",
+            "Discord REST calls waiting in the outbound queue.",
+            lambda: len(self.outbound),
+        )
+        registry.gauge(
+            "pacilfess_recent_fingerprints",
+            "Confession fingerprints kept to detect near-duplicates.",
+            lambda: len(self.duplicates),
+        )
+        registry.gauge(
+            "pacilfess_guilds", "Guilds seen by this process.", lambda: len(self.guilds)
+        )
+        # A shared store is not inspected from here, it has its own metrics.
+        if isinstance(self.state, LocalStateStore):
+            state = self.state
+            registry.gauge(
+                "pacilfess_active_bans",
+                "Bans held in memory.",
+                lambda: state.stats["bans"],
+            )
+            registry.gauge(
+                "pacilfess_cooldown_entries",
+                "Users tracked for cooldown.",
+                lambda: state.stats["cooldowns"],
+            )
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        with event_seconds.time(event_name):
+            await super()._run_event(coro, event_name, *args, **kwargs)
+
+    @property
+    def http_session(self) -> aiohttp.ClientSession:
+        """Long-lived session for outside HTTP requests, closed in close()."""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=config.attachment_timeout)
+            )
+        return self._http_session
+
+    async def reply(self, ctx: Union[Context, SlashContext], *args, **kwargs):
+        """Sends a command reply, outside the outbound queue so it is never late."""
+        return await self.outbound.run(Priority.REPLY, ctx.send, *args, **kwargs)
+
+    async def edit_confession(self, channel: TextChannel, message_id: int, text: str):
+        """Replaces a confession's content, without fetching the message first."""
+        message = channel.get_partial_message(message_id)
+        await self.outbound.run(
+            Priority.MODERATION,
+            message.edit,
+            embed=create_embed(text, use_quote=False),
+            merge_key=("edit", message_id),
+            bucket=channel.id,
+        )
+
+    async def delete_confession(self, confess: AnyConfess, text: str, reason: str):
+        """Replaces a confession with text and forgets it, for every delete path.
+
+        reason labels the deletion in the deletions metric."""
+        channel_id = confess.channel_id
+        if not channel_id:
+            # Older rows do not know their channel, they were all sent to the
+            # configured one.
+            server_conf = await self.config_cache.get(confess.server_id)
+            channel_id = server_conf.confession_channel if server_conf else None
+
+        # A deleted channel took the message with it, only the row is left.
+        channel: Optional[TextChannel] = None
+        if channel_id:
+            channel = cast(Optional[TextChannel], self.get_channel(channel_id))
+        if channel:
+            await self.edit_confession(channel, confess.message_id, text)
+
+        await self.confessions.delete(confess)
+        deletions_total.inc(reason)
+        self.tombstone(confess.server_id, confess.message_id)
+        await self.votes.forget(confess.server_id, confess.message_id)
+
+    async def on_vote_delete(self, confess: AnyConfess):
         """Logs data of vote deleted confess, if enabled.
 
         This will create an encrypted identifier of the confess object,
@@ -58,16 +209,14 @@ class Fess(Bot):
             mid=confess.message_id,
             sid=confess.server_id,
         )
-        encrypted = enc_data(deleted_data)
+        encrypted = await enc_data(deleted_data)
         embed = create_embed(
             confess.content + f"\r\n\r\nID: `${encrypted.decode('UTF-8')}`",
             attachment=confess.attachment,
             footer="To ban this user, use /fessmin muteid <ID>",
         )
 
-        server_conf = await ServerConfig.objects.get_or_none(
-            server_id=confess.server_id
-        )
+        server_conf = await self.config_cache.get(confess.server_id)
         if not server_conf or not server_conf.votelog_channel:
             return
 
@@ -75,7 +224,13 @@ class Fess(Bot):
             Optional[TextChannel], self.get_channel(server_conf.votelog_channel)
         )
         if log_channel:
-            await log_channel.send("Confession deleted from vote:", embed=embed)
+            await self.outbound.run(
+                Priority.LOG,
+                log_channel.send,
+                "Confession deleted from vote:",
+                embed=embed,
+                bucket=log_channel.id,
+            )
 
     async def on_sev_change(
         self,
@@ -94,7 +249,6 @@ class Fess(Bot):
         After the total severity has been calculated, the user is then muted for
         total_violations ** 2 / 2 hour(s)."""
         current_time = datetime.now()
-        month_ago = current_time - timedelta(weeks=4)
 
         if isinstance(user, str):
             user_hash = user
@@ -106,72 +260,148 @@ class Fess(Bot):
         else:
             server_id = server
 
-        # Remove existing ban just to be safe.
-        existing_ban = await check_banned(user_hash, server_id)
-        if existing_ban:
-            await existing_ban.delete()
-
-        violations = await Violation.objects.all(
-            user_id=user_hash,
-            server_id=server_id,
-            timestamp__gte=month_ago.timestamp(),
+        total_violations = await self.violations.total(
+            user_hash, server_id, current_time.timestamp()
         )
-        total_violations = sum([x.severity for x in violations])
         minutes = total_violations ** 2 * 30
 
         end_dt = current_time + timedelta(minutes=minutes)
-        await BannedUser.objects.create(
-            user_id=user_hash,
-            server_id=server_id,
-            timeout=end_dt.timestamp(),
-        )
+        await self.bans.ban(user_hash, server_id, end_dt.timestamp())
+        mutes_total.inc()
 
-    async def on_raw_reaction_add(self, event: RawReactionActionEvent):
-        """Checks new reaction if it is a vote deletion for a Confess.
+    async def _vote_config(self, event: RawReactionActionEvent):
+        """Returns the server config if the reaction is a vote on a confession.
 
-        If the reaction of X emoji is above the specified minimum vote, then
-        we will delete the confession and call on_vote_delete()."""
-        confess = await Confess.objects.get_or_none(
-            server_id=event.guild_id, message_id=event.message_id
-        )
-        if not confess:
-            return
+        Everything here is answered from memory, most reactions on the server
+        are not votes on a confession and should never reach the database."""
+        if event.emoji.name != "❌" or not event.guild_id:
+            return None
+        if self.tombstones.get((event.guild_id, event.message_id)):
+            return None
+        if self.user and event.user_id == self.user.id:
+            return None
+
+        if not self.confess_index.contains(event.guild_id, event.message_id):
+            return None
+        server_conf = await self.config_cache.get(event.guild_id)
+        if not server_conf:
+            return None
+
+        # The confession channel may have moved since, so compare against the
+        # channel it was sent to. Older rows were all sent to the configured one.
+        channel_id = self.confess_index.channel(event.guild_id, event.message_id)
+        if event.channel_id != (channel_id or server_conf.confession_channel):
+            return None
+        return server_conf
 
-        server_conf = await ServerConfig.objects.get(server_id=event.guild_id)
-        confession_channel: TextChannel = cast(
-            TextChannel, self.get_channel(event.channel_id)
+    async def _fetch_votes(self, event: RawReactionActionEvent) -> int:
+        confession_channel = cast(
+            Optional[TextChannel], self.get_channel(event.channel_id)
+        )
+        if not confession_channel:
+            return 0
+        message = await self.outbound.run(
+            Priority.MODERATION,
+            confession_channel.fetch_message,
+            event.message_id,
+            bucket=confession_channel.id,
         )
-        message = await confession_channel.fetch_message(event.message_id)
 
         # OK I legit don't know why is Reaction.emoji here is an str but on the event object,
         # its a PartialEmoji, kinda makes it a huge pain in the ass to be honest.
-        reaction = cast(Reaction, discord.utils.get(message.reactions, emoji="❌"))
-        if event.emoji.name == "❌" and reaction.count > server_conf.minimum_vote:
-            await message.edit(
-                embed=create_embed(
-                    "*This confession has been deleted by vote.*",
-                    use_quote=False,
-                )
+        reaction = cast(
+            Optional[Reaction], discord.utils.get(message.reactions, emoji="❌")
+        )
+        if not reaction:
+            return 0
+        # The bot's own reaction is not a vote.
+        return reaction.count - 1 if reaction.me else reaction.count
+
+    def tombstone(self, server_id: int, message_id: int):
+        """Marks a confession as deleted, must be called on every delete path."""
+        self.tombstones.set((server_id, message_id), True)
+        self.confess_index.discard(server_id, message_id)
+
+    async def _count_votes(self, event: RawReactionActionEvent, amount: int):
+        server_conf = await self._vote_config(event)
+        if not server_conf:
+            return
+        if amount > 0:
+            votes_total.inc()
+
+        async def on_count(votes: int) -> bool:
+            if votes < server_conf.minimum_vote:
+                return False
+            await self._vote_delete(event)
+            return True
+
+        await self.votes.count(
+            cast(int, event.guild_id),
+            event.message_id,
+            amount,
+            lambda: self._fetch_votes(event),
+            on_count,
+        )
+
+    async def _vote_delete(self, event: RawReactionActionEvent):
+        """Deletes a confession that reached the minimum vote.
+
+        Only called by the one evaluation running for the message, the claim
+        keeps other bot processes from deleting it at the same time."""
+        guild_id = cast(int, event.guild_id)
+        if not await self.votes.claim(guild_id, event.message_id):
+            # Another process is deleting it, stop counting for a while.
+            self.tombstones.set((guild_id, event.message_id), True)
+            return
+
+        try:
+            confess = self.confessions.get(
+                guild_id, event.message_id
+            ) or await get_confess(guild_id, event.message_id)
+            if not confess:
+                self.tombstone(guild_id, event.message_id)
+                await self.votes.forget(guild_id, event.message_id)
+                return
+
+            await self.delete_confession(
+                confess, "*This confession has been deleted by vote.*", "vote"
             )
-            await confess.delete()
-            await self.on_vote_delete(confess)
+        except Exception:
+            await self.votes.release(guild_id, event.message_id)
+            raise
+
+        await self.on_vote_delete(confess)
+
+    async def on_raw_reaction_add(self, event: RawReactionActionEvent):
+        """Checks new reaction if it is a vote deletion for a Confess.
+
+        If the reaction of X emoji reaches the specified minimum vote, then
+        we will delete the confession and call on_vote_delete()."""
+        await self._count_votes(event, 1)
+
+    async def on_raw_reaction_remove(self, event: RawReactionActionEvent):
+        """Takes back a vote when its reaction is removed."""
+        await self._count_votes(event, -1)
 
     async def on_slash_command_error(self, ctx: SlashContext, error: Exception):
         if isinstance(error, commands.NoPrivateMessage):
-            return await ctx.send("You can only use this inside a server.", hidden=True)
+            return await self.reply(
+                ctx, "You can only use this inside a server.", hidden=True
+            )
         elif isinstance(error, NoConfig):
-            return await ctx.send("Server is not configured.", hidden=True)
+            return await self.reply(ctx, "Server is not configured.", hidden=True)
         elif isinstance(error, Forbidden):
-            return await ctx.send("You cannot use this command.", hidden=True)
+            return await self.reply(ctx, "You cannot use this command.", hidden=True)
         else:
             error = getattr(error, "original", error)
             traceback.print_exception(
                 type(error), error, error.__traceback__, file=sys.stderr
             )
-            return await ctx.send(
+            return await self.reply(
+                ctx,
                 "An exception has occured: `{}` on command `{}`".format(
                     error.__class__.__name__, ctx.name
-                )
+                ),
             )
 
     async def on_command_error(self, ctx: Context, error: Exception):
@@ -182,37 +412,85 @@ class Fess(Bot):
         elif isinstance(error, commands.UserInputError):
             return await ctx.send_help(ctx.command)
         elif isinstance(error, commands.CommandOnCooldown):
-            return await ctx.send(
-                f"Rate limited. Try again in `{error.retry_after}` seconds."
+            return await self.reply(
+                ctx, f"Rate limited. Try again in `{error.retry_after}` seconds."
             )
         elif isinstance(error, commands.CommandInvokeError):
             error = getattr(error, "original", error)
             traceback.print_exception(
                 type(error), error, error.__traceback__, file=sys.stderr
             )
-            return await ctx.send(
+            return await self.reply(
+                ctx,
                 "An exception has occured: `{}` on command `{}`".format(
                     error.__class__.__name__, ctx.command.name
-                )
+                ),
             )
 
+    async def on_shard_ready(self, shard_id: int):
+        print(f"Shard {shard_id} ready.")
+
     async def on_ready(self):
-        print("Running!")
+        print(f"Running! ({self.shard_range})")
         presence = discord.Game(name="/confess")
         await self.change_presence(activity=presence)
 
-    async def start(self, *args, **kwargs):
+    async def prepare(self):
+        """Connects to the database and loads the in-memory state.
+
+        Called by start(), separate so the bot can be driven without a
+        gateway connection (see benchmarks/simulator.py)."""
         if not database.is_connected:
             await database.connect()
+        await self.state.connect()
+        owns = self.shard_range.owns
+        await self.config_cache.load(owns)
+        await self.filters.load(owns)
+        await self.confess_index.load(owns)
+        await self.bans.load(owns)
+        if config.cooldown_state_path:
+            path = self.shard_range.suffix(config.cooldown_state_path)
+            self.state.load_cooldowns(path, owns)
+
+        writer.start()
+        self.confessions.start()
+        self.outbound.start()
+        self.bans.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+
+    async def start(self, *args, **kwargs):
+        await self.prepare()
         await super().start(*args, **kwargs)
 
     async def close(self):
+        await self.bans.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        if config.cooldown_state_path:
+            path = self.shard_range.suffix(config.cooldown_state_path)
+            self.state.save_cooldowns(path)
+
+        await self.outbound.stop()
+        if self._http_session is not None:
+            await self._http_session.close()
+
         # Cleanup db connection
+        await self.confessions.stop()
+        await writer.stop()
         if database.is_connected:
             await database.disconnect()
+        await self.state.close()
         await super().close()
 
 
 def run():
-    bot = Fess(command_prefix="p!", intents=discord.Intents.default())
+    logging.basicConfig(level=config.log_level)
+    shards = ShardRange.from_config()
+    bot = Fess(
+        command_prefix="p!",
+        intents=discord.Intents.default(),
+        shard_ids=shards.shard_ids,
+        shard_count=shards.shard_count,
+    )
     bot.run(config.token)
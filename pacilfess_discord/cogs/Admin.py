@@ -1,21 +1,27 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional, cast
 
-from discord import Member, TextChannel
+from discord import Embed, Member, TextChannel
 from discord.ext.commands import Cog, check
+from discord.utils import escape_markdown
 from discord_slash import SlashContext, cog_ext
 from discord_slash.model import SlashCommandOptionType
 from discord_slash.utils.manage_commands import create_choice, create_option
 
-from pacilfess_discord.helper.embed import create_embed
-from pacilfess_discord.helper.hasher import decrypt_data, hash_user
+from pacilfess_discord.helper.hasher import decrypt_data, hash_user, upgrade_hash
+from pacilfess_discord.helper.metrics import command_seconds
+from pacilfess_discord.helper.queries import AnyConfess, get_confess, search_confess
 from pacilfess_discord.helper.regex import DISCORD_RE
-from pacilfess_discord.helper.utils import check_banned, is_admin
-from pacilfess_discord.models import Confess, DeletedData, ServerConfig, Violation
+from pacilfess_discord.helper.scheduler import Priority
+from pacilfess_discord.helper.utils import is_admin
+from pacilfess_discord.models import DeletedData
 
 if TYPE_CHECKING:
     from pacilfess_discord.bot import Fess
 
+SEARCH_PAGE_SIZE = 10
+SNIPPET_LENGTH = 120
+
 severity_option = create_option(
     name="severity",
     description="The severity of the rule violation.",
@@ -31,10 +37,11 @@ class Admin(Cog):
     def __init__(self, bot: "Fess"):
         self.bot = bot
 
-    async def _delete_fess(self, ctx: SlashContext, link: str) -> Optional[Confess]:
-        server_conf = await ServerConfig.objects.get_or_create(server_id=ctx.guild_id)
+    async def _delete_fess(self, ctx: SlashContext, link: str) -> Optional[AnyConfess]:
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild_id)
         if not server_conf.confession_channel:
-            return await ctx.send(
+            return await self.bot.reply(
+                ctx,
                 "This server has not been configured. Please contact the server admin.",
                 hidden=True,
             )
@@ -43,37 +50,33 @@ class Admin(Cog):
             Optional[TextChannel], self.bot.get_channel(server_conf.confession_channel)
         )
         if not confession_channel:
-            return await ctx.send(
+            return await self.bot.reply(
+                ctx,
                 "Cannot seem to find confession channel. Maybe it was deleted?",
                 hidden=True,
             )
 
         re_result = DISCORD_RE.search(link)
         if not re_result:
-            await ctx.send("Invalid confession link!", hidden=True)
+            await self.bot.reply(ctx, "Invalid confession link!", hidden=True)
             return None
 
-        confess = await Confess.objects.get_or_none(
-            message_id=int(re_result.group("MESSAGE")), server_id=ctx.guild_id
-        )
+        message_id = int(re_result.group("MESSAGE"))
+        confess = self.bot.confessions.get(
+            ctx.guild_id, message_id
+        ) or await get_confess(ctx.guild_id, message_id)
 
         if not confess:
-            await ctx.send(
+            await self.bot.reply(
+                ctx,
                 "No such confession found.",
                 hidden=True,
             )
             return None
 
-        confess_id: int = confess.message_id
-        confess_msg = await confession_channel.fetch_message(confess_id)
-        await confess_msg.edit(
-            embed=create_embed(
-                "*This confession has been deleted by admin.*",
-                use_quote=False,
-            )
+        await self.bot.delete_confession(
+            confess, "*This confession has been deleted by admin.*", "admin"
         )
-
-        await confess.delete()
         return confess
 
     @cog_ext.cog_subcommand(
@@ -91,23 +94,21 @@ class Admin(Cog):
         ],
     )
     @check(is_admin)
+    @command_seconds.timed("fessmin mute")
     async def _mute(self, ctx: SlashContext, message: str, severity: int):
-        await ctx.defer(hidden=True)
+        await self.bot.outbound.run(Priority.REPLY, ctx.defer, hidden=True)
 
         current_time = datetime.now()
         confess = await self._delete_fess(ctx, message)
         if not confess:
-            await ctx.send("Confess cannot be found, aborting.", hidden=True)
+            await self.bot.reply(ctx, "Confess cannot be found, aborting.", hidden=True)
             return
 
-        await Violation.objects.create(
-            user_id=confess.user_id,
-            server_id=confess.server_id,
-            severity=severity,
-            timestamp=current_time.timestamp(),
+        await self.bot.violations.add(
+            confess.user_id, confess.server_id, severity, current_time.timestamp()
         )
         await self.bot.on_sev_change(confess.user_id, confess.server_id)
-        await ctx.send("User has been muted.", hidden=True)
+        await self.bot.reply(ctx, "User has been muted.", hidden=True)
 
     @cog_ext.cog_subcommand(
         base="fessmin",
@@ -124,27 +125,28 @@ class Admin(Cog):
         ],
     )
     @check(is_admin)
+    @command_seconds.timed("fessmin muteid")
     async def _muteid(self, ctx: SlashContext, id: str, severity: int):
-        await ctx.defer(hidden=True)
+        await self.bot.outbound.run(Priority.REPLY, ctx.defer, hidden=True)
 
         current_time = datetime.now()
         try:
-            deleted_data = decrypt_data(id, DeletedData)
+            deleted_data = await decrypt_data(id, DeletedData)
         except Exception:
-            await ctx.send(
+            await self.bot.reply(
+                ctx,
                 "An error occured, are you sure you're sending the right ID?",
                 hidden=True,
             )
             return
 
-        await Violation.objects.create(
-            user_id=deleted_data.uid,
-            server_id=deleted_data.sid,
-            severity=severity,
-            timestamp=current_time.timestamp(),
+        # IDs logged before keyed hashing still carry the old user hash.
+        user_hash = upgrade_hash(deleted_data.uid)
+        await self.bot.violations.add(
+            user_hash, deleted_data.sid, severity, current_time.timestamp()
         )
-        await self.bot.on_sev_change(deleted_data.uid, deleted_data.sid)
-        await ctx.send("User has been muted.", hidden=True)
+        await self.bot.on_sev_change(user_hash, deleted_data.sid)
+        await self.bot.reply(ctx, "User has been muted.", hidden=True)
 
     @cog_ext.cog_subcommand(
         base="fessmin",
@@ -160,16 +162,15 @@ class Admin(Cog):
         ],
     )
     @check(is_admin)
+    @command_seconds.timed("fessmin unmute")
     async def _unmute(self, ctx: SlashContext, user: Member):
-        await ctx.defer(hidden=True)
+        await self.bot.outbound.run(Priority.REPLY, ctx.defer, hidden=True)
 
-        existing_ban = await check_banned(hash_user(user), ctx.guild_id)
-        if not existing_ban:
-            await ctx.send("User is not muted.", hidden=True)
+        if not await self.bot.bans.unban(hash_user(user), ctx.guild_id):
+            await self.bot.reply(ctx, "User is not muted.", hidden=True)
             return
 
-        await existing_ban.delete()
-        await ctx.send("User has been unmuted.", hidden=True)
+        await self.bot.reply(ctx, "User has been unmuted.", hidden=True)
 
     @cog_ext.cog_subcommand(
         base="fessmin",
@@ -185,11 +186,71 @@ class Admin(Cog):
         ],
     )
     @check(is_admin)
+    @command_seconds.timed("fessmin delete")
     async def _delete(self, ctx: SlashContext, link: str):
-        await ctx.defer(hidden=True)
+        await self.bot.outbound.run(Priority.REPLY, ctx.defer, hidden=True)
 
         if await self._delete_fess(ctx, link):
-            await ctx.send("Done!", hidden=True)
+            await self.bot.reply(ctx, "Done!", hidden=True)
+
+    @cog_ext.cog_subcommand(
+        base="fessmin",
+        name="search",
+        description="Searches the confessions sent in this server.",
+        options=[
+            create_option(
+                name="query",
+                description="Words the confession contains, end a word with * "
+                + "to match its prefix.",
+                option_type=SlashCommandOptionType.STRING,
+                required=True,
+            ),
+            create_option(
+                name="page",
+                description="Page of the results, starting from 1.",
+                option_type=SlashCommandOptionType.INTEGER,
+                required=False,
+            ),
+        ],
+    )
+    @check(is_admin)
+    @command_seconds.timed("fessmin search")
+    async def _search(self, ctx: SlashContext, query: str, page: int = 1):
+        await self.bot.outbound.run(Priority.REPLY, ctx.defer, hidden=True)
+
+        page = max(page, 1)
+        # One extra row tells whether there is a next page.
+        results = await search_confess(
+            ctx.guild_id,
+            query,
+            SEARCH_PAGE_SIZE + 1,
+            (page - 1) * SEARCH_PAGE_SIZE,
+        )
+        if not results:
+            await self.bot.reply(ctx, "No confessions found.", hidden=True)
+            return
+
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild_id)
+        lines = []
+        for confess in results[:SEARCH_PAGE_SIZE]:
+            snippet = " ".join(confess.content.split())
+            if len(snippet) > SNIPPET_LENGTH:
+                snippet = snippet[: SNIPPET_LENGTH - 1] + "…"
+            channel_id = confess.channel_id or server_conf.confession_channel
+            link = (
+                f"https://discord.com/channels/{confess.server_id}"
+                + f"/{channel_id}/{confess.message_id}"
+            )
+            lines.append(
+                f"[<t:{int(confess.sendtime)}:f>]({link}) {escape_markdown(snippet)}"
+            )
+
+        embed = Embed(title=f"Search: {query}"[:256], description="\n".join(lines))
+        footer = f"Page {page}"
+        if len(results) > SEARCH_PAGE_SIZE:
+            footer += f", use page:{page + 1} for more."
+        embed.set_footer(text=footer)
+        await self.bot.reply(ctx, embed=embed, hidden=True)
 
 
 def setup(bot: "Fess"):
@@ -1,4 +1,5 @@
-from typing import TYPE_CHECKING
+import time
+from typing import TYPE_CHECKING, Dict, List
 from discord import Embed
 
 from discord.channel import TextChannel
@@ -8,16 +9,35 @@ from discord.ext.commands.core import guild_only
 from discord.guild import Guild
 from discord.role import Role
 
+from pacilfess_discord.helper.metrics import command_seconds
 from pacilfess_discord.helper.utils import owner_or_admin
-from pacilfess_discord.models import ServerConfig
+from pacilfess_discord.helper.word_filter import (
+    MAX_ENTRIES,
+    MAX_TERM_LENGTH,
+    validate_pattern,
+)
 
 if TYPE_CHECKING:
     from pacilfess_discord.bot import Fess
 
+# Embed description limit, as of discord.py 1.7.
+EMBED_LIMIT = 2048
+
 
 class Config(commands.Cog):
     def __init__(self, bot: "Fess"):
         self.bot = bot
+        self._started: Dict[int, float] = {}
+
+    async def cog_before_invoke(self, ctx: Context):
+        self._started[id(ctx)] = time.perf_counter()
+
+    async def cog_after_invoke(self, ctx: Context):
+        started = self._started.pop(id(ctx), None)
+        if started is not None and ctx.command:
+            command_seconds.observe(
+                time.perf_counter() - started, "p!" + ctx.command.name
+            )
 
     @commands.command(
         name="fessChannel",
@@ -27,10 +47,12 @@ class Config(commands.Cog):
     @owner_or_admin()
     async def fess_channel(self, ctx: Context, channel: TextChannel):
         assert isinstance(ctx.guild, Guild)
-        server_conf = await ServerConfig.objects.get_or_create(server_id=ctx.guild.id)
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild.id)
         server_conf.confession_channel = channel.id
-        await server_conf.update()
-        await ctx.send(f"Done setting confession channel to {channel.mention}.")
+        await self.bot.config_cache.save(server_conf)
+        await self.bot.reply(
+            ctx, f"Done setting confession channel to {channel.mention}."
+        )
 
     @commands.command(
         name="cooldown",
@@ -41,12 +63,12 @@ class Config(commands.Cog):
     async def set_cooldown(self, ctx: Context, cooldown: int):
         assert isinstance(ctx.guild, Guild)
         if cooldown < 0:
-            return await ctx.send("Cooldown cannot be negative.")
+            return await self.bot.reply(ctx, "Cooldown cannot be negative.")
 
-        server_conf = await ServerConfig.objects.get_or_create(server_id=ctx.guild.id)
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild.id)
         server_conf.cooldown_time = cooldown
-        await server_conf.update()
-        await ctx.send(f"Done setting cooldown time to {cooldown} seconds.")
+        await self.bot.config_cache.save(server_conf)
+        await self.bot.reply(ctx, f"Done setting cooldown time to {cooldown} seconds.")
 
     @commands.command(
         name="voteLogChannel",
@@ -56,10 +78,12 @@ class Config(commands.Cog):
     @owner_or_admin()
     async def votelog_channel(self, ctx: Context, channel: TextChannel):
         assert isinstance(ctx.guild, Guild)
-        server_conf = await ServerConfig.objects.get_or_create(server_id=ctx.guild.id)
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild.id)
         server_conf.votelog_channel = channel.id
-        await server_conf.update()
-        await ctx.send(f"Done setting vote logging channel to {channel.mention}.")
+        await self.bot.config_cache.save(server_conf)
+        await self.bot.reply(
+            ctx, f"Done setting vote logging channel to {channel.mention}."
+        )
 
     @commands.command(
         name="addAdminRole",
@@ -69,14 +93,16 @@ class Config(commands.Cog):
     @owner_or_admin()
     async def add_admin(self, ctx: Context, role: Role):
         assert isinstance(ctx.guild, Guild)
-        server_conf = await ServerConfig.objects.get_or_create(server_id=ctx.guild.id)
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild.id)
         if role.id in server_conf.admin_roles:
-            await ctx.send("Users with that role is already assigned as admin.")
+            await self.bot.reply(
+                ctx, "Users with that role is already assigned as admin."
+            )
             return
 
         server_conf.admin_roles.append(role.id)
-        await server_conf.update()
-        await ctx.send(f"Done adding {role.mention} to admins.")
+        await self.bot.config_cache.save(server_conf)
+        await self.bot.reply(ctx, f"Done adding {role.mention} to admins.")
 
     @commands.command(
         name="minimumVote",
@@ -88,12 +114,88 @@ class Config(commands.Cog):
         assert isinstance(ctx.guild, Guild)
 
         if minimum < 1:
-            return await ctx.send("Minimum vote needs to be at least 1.")
+            return await self.bot.reply(ctx, "Minimum vote needs to be at least 1.")
 
-        server_conf = await ServerConfig.objects.get_or_create(server_id=ctx.guild.id)
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild.id)
         server_conf.minimum_vote = minimum
-        await server_conf.update()
-        await ctx.send(f"Done setting minimum vote deletion to {minimum}.")
+        await self.bot.config_cache.save(server_conf)
+        await self.bot.reply(ctx, f"Done setting minimum vote deletion to {minimum}.")
+
+    async def _add_filter(self, ctx: Context, patterns: List[str], is_regex: bool):
+        assert isinstance(ctx.guild, Guild)
+        entries = await self.bot.filters.entries(ctx.guild.id)
+        if len(entries) + len(patterns) > MAX_ENTRIES:
+            return await self.bot.reply(
+                ctx, f"The filter can have at most {MAX_ENTRIES} entries."
+            )
+
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild.id)
+        added = await self.bot.filters.add(server_conf, patterns, is_regex)
+        await self.bot.reply(ctx, f"Done adding {len(added)} entries to the filter.")
+
+    @commands.command(
+        name="filterAdd",
+        help="Blocks words or phrases in confessions, separate them with commas.",
+    )
+    @guild_only()
+    @owner_or_admin()
+    async def filter_add(self, ctx: Context, *, terms: str):
+        patterns = [x.strip() for x in terms.split(",") if x.strip()]
+        if any(len(x) > MAX_TERM_LENGTH for x in patterns):
+            return await self.bot.reply(
+                ctx, f"Terms can be at most {MAX_TERM_LENGTH} characters."
+            )
+        await self._add_filter(ctx, patterns, False)
+
+    @commands.command(
+        name="filterRegex",
+        help="Blocks confessions matching a regular expression. It is matched "
+        + "against the confession in lowercase, with whitespace collapsed. "
+        + "Backreferences and repeating something already repeated, like "
+        + "(a+)+, are not allowed.",
+    )
+    @guild_only()
+    @owner_or_admin()
+    async def filter_regex(self, ctx: Context, *, pattern: str):
+        error = validate_pattern(pattern)
+        if error:
+            return await self.bot.reply(ctx, error)
+        await self._add_filter(ctx, [pattern], True)
+
+    @commands.command(
+        name="filterRemove",
+        help="Removes a word, phrase or regular expression from the filter.",
+    )
+    @guild_only()
+    @owner_or_admin()
+    async def filter_remove(self, ctx: Context, *, pattern: str):
+        assert isinstance(ctx.guild, Guild)
+        if not await self.bot.filters.remove(ctx.guild.id, pattern):
+            return await self.bot.reply(ctx, "That is not in the filter.")
+        await self.bot.reply(ctx, "Done removing it from the filter.")
+
+    @commands.command(name="filterList", help="Lists the filtered words and patterns.")
+    @guild_only()
+    @owner_or_admin()
+    async def filter_list(self, ctx: Context):
+        assert isinstance(ctx.guild, Guild)
+        entries = await self.bot.filters.entries(ctx.guild.id)
+        if not entries:
+            return await self.bot.reply(ctx, "The filter is empty.")
+
+        lines: List[str] = []
+        length = 0
+        for entry in entries:
+            line = f"`/{entry.pattern}/`" if entry.is_regex else f"`{entry.pattern}`"
+            # Leaves room in the embed for the line below.
+            if length + len(line) > EMBED_LIMIT - 64:
+                lines.append(f"...and {len(entries) - len(lines)} more.")
+                break
+            lines.append(line)
+            length += len(line) + 2
+
+        embed = Embed(title="Word Filter", description=", ".join(lines))
+        await self.bot.reply(ctx, embed=embed)
 
     @commands.command(name="listConfig", help="List all of the configuration.")
     @guild_only()
@@ -101,7 +203,8 @@ class Config(commands.Cog):
     async def list(self, ctx: Context):
         assert isinstance(ctx.guild, Guild)
 
-        server_conf = await ServerConfig.objects.get_or_create(server_id=ctx.guild.id)
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild.id)
+        filters = await self.bot.filters.entries(ctx.guild.id)
 
         channel_str = "None"
         if server_conf.confession_channel:
@@ -140,10 +243,11 @@ class Config(commands.Cog):
             + "\r\nMinimum vote for deletion: "
             + str(server_conf.minimum_vote)
             + f"\r\nCoooldown time: {cooldown}s"
+            + f"\r\nFiltered words and patterns: {len(filters)}"
         )
 
         embed = Embed(title="Server Configuration", description=conf_str)
-        await ctx.send(embed=embed)
+        await self.bot.reply(ctx, embed=embed)
 
 
 def setup(bot: "Fess"):
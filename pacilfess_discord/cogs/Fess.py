@@ -1,5 +1,6 @@
+import asyncio
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, Dict, Optional, cast
+from typing import TYPE_CHECKING, Optional, cast
 
 import aiohttp
 import discord
@@ -10,9 +11,17 @@ from discord_slash.utils.manage_commands import create_option
 
 from pacilfess_discord.helper.embed import create_embed
 from pacilfess_discord.helper.hasher import hash_user
+from pacilfess_discord.helper.metrics import command_seconds, rejections_total
+from pacilfess_discord.helper.queries import (
+    AnyConfess,
+    confess_exists,
+    get_recent_confess,
+)
 from pacilfess_discord.helper.regex import DISCORD_RE
-from pacilfess_discord.helper.utils import check_banned
-from pacilfess_discord.models import Confess, ServerConfig
+from pacilfess_discord.helper.scheduler import Priority
+from pacilfess_discord.helper.timing import StageTimer
+from pacilfess_discord.helper.ttl_cache import TTLCache
+from pacilfess_discord.models import Confess
 
 if TYPE_CHECKING:
     from pacilfess_discord.bot import Fess as FessBot
@@ -21,17 +30,33 @@ if TYPE_CHECKING:
 class Fess(Cog):
     def __init__(self, bot: "FessBot"):
         self.bot = bot
-        self.last_timestamp: Dict[int, Dict[str, float]] = {}
+        self.attachment_cache: TTLCache[str, bool] = TTLCache(max_size=1024, ttl=3600)
+
+    async def _check_attachment(self, url: Optional[str]):
+        # No attachment is always fine.
+        if not url:
+            return True
+
+        is_image = self.attachment_cache.get(url)
+        if is_image is not None:
+            return is_image
 
-    async def _check_attachment(self, url: str):
         try:
-            async with aiohttp.ClientSession(raise_for_status=True) as session:
-                async with session.head(url) as resp:
-                    resp.raise_for_status()
-                    return resp.headers["Content-Type"].startswith("image")
+            async with self.bot.http_session.head(url) as resp:
+                resp.raise_for_status()
+                is_image = resp.headers.get("Content-Type", "").startswith("image")
+        except aiohttp.ClientResponseError as exc:
+            # Rate limits and server errors say nothing about the attachment.
+            if exc.status == 429 or exc.status >= 500:
+                return False
+            is_image = False
         except Exception:
+            # Timeouts and connection errors might be temporary, don't cache them.
             return False
 
+        self.attachment_cache.set(url, is_image)
+        return is_image
+
     async def _get_reply(
         self, ctx: SlashContext, target_channel: TextChannel, confession: str
     ):
@@ -42,11 +67,10 @@ class Fess(Cog):
                 message_id = int(link.group("MESSAGE"))
 
                 # Ensure message actually exists and is in confess channel.
-                confess = await Confess.objects.get_or_none(
-                    server_id=ctx.guild_id,
-                    message_id=message_id,
-                )
-                if not confess:
+                exists = self.bot.confessions.get(
+                    ctx.guild_id, message_id
+                ) or await confess_exists(ctx.guild_id, message_id)
+                if not exists:
                     return None
 
                 message_ref = discord.MessageReference(
@@ -75,98 +99,164 @@ class Fess(Cog):
         ],
     )
     @guild_only()
+    @command_seconds.timed("confess")
     async def _confess(
         self,
         ctx: SlashContext,
         confession: str,
         attachment: Optional[str] = None,
     ):
-        await ctx.defer(hidden=True)
+        timer = StageTimer("/confess")
+        await self.bot.outbound.run(Priority.REPLY, ctx.defer, hidden=True)
+        timer.mark("defer")
 
         confession = confession.strip()
         current_time = datetime.now()
         user_hash = hash_user(ctx.author)
 
         # Check if server is configured.
-        server_conf = await ServerConfig.objects.get_or_create(server_id=ctx.guild_id)
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild_id)
         if not server_conf.confession_channel:
-            return await ctx.send(
+            return await self.bot.reply(
+                ctx,
                 "This server has not been configured. Please contact the server admin.",
                 hidden=True,
             )
 
-        # Check server cooldown
-        if server_conf.cooldown_time and ctx.guild_id in self.last_timestamp:
-            server_timestamps = self.last_timestamp[ctx.guild_id]
-
-            if user_hash in server_timestamps:
-                last_time = server_timestamps[user_hash]
-                delta = current_time.timestamp() - last_time
-                if delta < server_conf.cooldown_time:
-                    eta = int(server_conf.cooldown_time - delta)
-                    return await ctx.send(
-                        (
-                            "Server is in cooldown mode, "
-                            + f"you may send a confession again after {eta} seconds."
-                        ),
-                        hidden=True,
-                    )
-            server_timestamps[user_hash] = current_time.timestamp()
-
-        if ctx.guild_id not in self.last_timestamp:
-            self.last_timestamp[ctx.guild_id] = {}
+        # Check server cooldown, the ban is looked up in the same round-trip.
+        # Configs from before the cooldown column have it as NULL.
+        state = await self.bot.state.check_confess(
+            ctx.guild_id, user_hash, server_conf.cooldown_time or 0
+        )
+        if state.cooldown_left is not None:
+            eta = int(state.cooldown_left)
+            return await self.bot.reply(
+                ctx,
+                (
+                    "Server is in cooldown mode, "
+                    + f"you may send a confession again after {eta} seconds."
+                ),
+                hidden=True,
+            )
 
         # Fetch the target channel, and check if it exists.
         target_channel = cast(
             Optional[TextChannel], self.bot.get_channel(server_conf.confession_channel)
         )
         if not target_channel:
-            return await ctx.send(
+            return await self.bot.reply(
+                ctx,
                 "Cannot seem to find confession channel. Maybe it was deleted?",
                 hidden=True,
             )
 
         # Check if sender is banned or not.
-        banned_data = await check_banned(user_hash, ctx.guild_id)
-        if banned_data:
-            await ctx.send(
+        if state.banned_until:
+            banned_until = datetime.fromtimestamp(state.banned_until)
+            await self.bot.reply(
+                ctx,
                 "You are banned from sending a confession until "
-                + f"`{banned_data.datetime.isoformat(' ', 'seconds')}`.",
+                + f"`{banned_until.isoformat(' ', 'seconds')}`.",
                 hidden=True,
             )
             return
 
-        if attachment and not await self._check_attachment(attachment):
-            await ctx.send(
+        # Blocked terms, before anything is sent anywhere.
+        word_filter = await self.bot.filters.get(ctx.guild_id)
+        if word_filter is not None and word_filter.search(confession) is not None:
+            rejections_total.inc("filter")
+            await self.bot.reply(
+                ctx,
+                "Your confession contains a blocked word or phrase.",
+                hidden=True,
+            )
+            return
+
+        timer.mark("checks")
+
+        # None of these need each other, so run them together. Their errors
+        # are still reported in the same order as before.
+        reply, valid_attachment, fingerprint = await asyncio.gather(
+            self._get_reply(ctx, target_channel, confession),
+            self._check_attachment(attachment),
+            self.bot.duplicates.fingerprint(confession),
+            return_exceptions=True,
+        )
+        timer.mark("validate")
+
+        if not valid_attachment:
+            await self.bot.reply(
+                ctx,
                 "Invalid attachment given! It can only be image.",
                 hidden=True,
             )
             return
+        if isinstance(reply, BaseException):
+            raise reply
+        if isinstance(fingerprint, BaseException):
+            raise fingerprint
 
         raw_confession = confession
-        reply = await self._get_reply(ctx, target_channel, confession)
         if reply:
             confession = DISCORD_RE.sub("", confession).strip()
             if not confession:
-                await ctx.send("Please send a message!", hidden=True)
+                await self.bot.reply(ctx, "Please send a message!", hidden=True)
                 return
 
+        # Checked and recorded in one go, so of several copies arriving at
+        # once only the first one gets through. Forgotten again if the send
+        # fails.
+        if fingerprint is not None and self.bot.duplicates.seen(
+            ctx.guild_id, fingerprint
+        ):
+            rejections_total.inc("duplicate")
+            await self.bot.reply(
+                ctx,
+                "A very similar confession was sent recently, "
+                + "please don't repeat or flood confessions.",
+                hidden=True,
+            )
+            return
+
         embed = create_embed(confession, attachment)
-        fess_message = await target_channel.send(
-            embed=embed, reference=reply, mention_author=False
-        )
-        await fess_message.add_reaction("❌")
-
-        # Save to database for moderation purposes.
-        await Confess.objects.create(
-            server_id=ctx.guild_id,
-            message_id=fess_message.id,
-            user_id=user_hash,
-            content=raw_confession,
-            sendtime=current_time.timestamp(),
-            attachment=attachment,
+        try:
+            fess_message = await self.bot.outbound.run(
+                Priority.REPLY,
+                target_channel.send,
+                embed=embed,
+                reference=reply,
+                mention_author=False,
+            )
+        except BaseException:
+            # Not sent, so it must not block the user from trying again.
+            if fingerprint is not None:
+                self.bot.duplicates.forget(ctx.guild_id, fingerprint)
+            raise
+        timer.mark("send")
+
+        # Brand new message, no need to ever fetch it to count votes.
+        self.bot.votes.seed(ctx.guild_id, fess_message.id)
+
+        # Save to database for moderation purposes, written in the background
+        # while the reaction is being added.
+        self.bot.confessions.add(
+            Confess(
+                server_id=ctx.guild_id,
+                message_id=fess_message.id,
+                channel_id=target_channel.id,
+                user_id=user_hash,
+                content=raw_confession,
+                sendtime=current_time.timestamp(),
+                attachment=attachment,
+            )
         )
-        await ctx.send("Done!", hidden=True)
+        self.bot.confess_index.add(ctx.guild_id, fess_message.id, target_channel.id)
+        await self.bot.outbound.run(Priority.REPLY, fess_message.add_reaction, "❌")
+        timer.mark("react")
+
+        await self.bot.reply(ctx, "Done!", hidden=True)
+        timer.mark("reply")
+        timer.log()
 
     @cog_ext.cog_slash(
         name="delete",
@@ -181,17 +271,19 @@ class Fess(Cog):
         ],
     )
     @guild_only()
+    @command_seconds.timed("delete")
     async def _delete_fess(self, ctx: SlashContext, link: Optional[str] = None):
-        await ctx.defer(hidden=True)
+        await self.bot.outbound.run(Priority.REPLY, ctx.defer, hidden=True)
 
         current_time = datetime.now()
         user_hash = hash_user(ctx.author)
-        five_mins_ago = current_time - timedelta(minutes=5)
+        five_mins_ago = int((current_time - timedelta(minutes=5)).timestamp())
 
         # Check if server is configured.
-        server_conf = await ServerConfig.objects.get_or_create(server_id=ctx.guild_id)
+        server_conf = await self.bot.config_cache.get_or_create(ctx.guild_id)
         if not server_conf.confession_channel:
-            return await ctx.send(
+            return await self.bot.reply(
+                ctx,
                 "This server has not been configured. Please contact the server admin.",
                 hidden=True,
             )
@@ -201,7 +293,8 @@ class Fess(Cog):
             Optional[TextChannel], self.bot.get_channel(server_conf.confession_channel)
         )
         if not confession_channel:
-            return await ctx.send(
+            return await self.bot.reply(
+                ctx,
                 "Cannot seem to find confession channel. Maybe it was deleted?",
                 hidden=True,
             )
@@ -209,46 +302,40 @@ class Fess(Cog):
         if link:
             re_result = DISCORD_RE.search(link)
             if not re_result:
-                await ctx.send("Invalid confession link!", hidden=True)
+                await self.bot.reply(ctx, "Invalid confession link!", hidden=True)
                 return
 
-            confess = await Confess.objects.order_by("-sendtime").get_or_none(
-                server_id=ctx.guild_id,
-                message_id=int(re_result.group("MESSAGE")),
-                user_id=user_hash,
-                sendtime__gt=five_mins_ago.timestamp(),
+            message_id = int(re_result.group("MESSAGE"))
+            confess: Optional[AnyConfess] = self.bot.confessions.get(
+                ctx.guild_id, message_id
             )
+            if confess and (
+                confess.user_id != user_hash or confess.sendtime <= five_mins_ago
+            ):
+                confess = None
+            elif not confess:
+                confess = await get_recent_confess(
+                    ctx.guild_id, user_hash, five_mins_ago, message_id
+                )
         else:
             # If link is not found, check the last 5 mins for confess and
-            # pick the LATEST one
-            confess = (
-                await Confess.objects.order_by("-sendtime")
-                .limit(1)
-                .get_or_none(
-                    server_id=ctx.guild_id,
-                    user_id=user_hash,
-                    sendtime__gt=five_mins_ago.timestamp(),
-                )
-            )
+            # pick the LATEST one, the ones not written yet are the newest.
+            confess = self.bot.confessions.latest_by(
+                ctx.guild_id, user_hash, five_mins_ago
+            ) or await get_recent_confess(ctx.guild_id, user_hash, five_mins_ago)
 
         if not confess:
-            await ctx.send(
+            await self.bot.reply(
+                ctx,
                 "No confession earlier than 5 minutes ago found.",
                 hidden=True,
             )
             return
 
-        confess_id: int = confess.message_id
-        confess_msg = await confession_channel.fetch_message(confess_id)
-        await confess_msg.edit(
-            embed=create_embed(
-                "*This confession has been deleted by the author.*",
-                use_quote=False,
-            )
+        await self.bot.delete_confession(
+            confess, "*This confession has been deleted by the author.*", "author"
         )
-
-        await confess.delete()
-        await ctx.send("Done!", hidden=True)
+        await self.bot.reply(ctx, "Done!", hidden=True)
 
 
 def setup(bot: "FessBot"):
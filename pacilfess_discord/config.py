@@ -1,20 +1,52 @@
 import json
+import re
 from dataclasses import dataclass
+from typing import List, Optional
 
 from dataclasses_json import DataClassJsonMixin
 
+ASYNC_DRIVER_RE = re.compile(r"^(?P<dialect>\w+)\+(?:asyncpg|aiopg|aiosqlite)://")
+
 
 @dataclass
 class Config(DataClassJsonMixin):
-    db_path: str
     token: str
     default_vote: int
     secret: str
+    db_path: str = ""
+    database_url: Optional[str] = None
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    sqlite_tuning: bool = True
+    sqlite_cache_size: int = -16000
+    sqlite_mmap_size: int = 268435456
+    sqlite_busy_timeout: float = 5.0
+    secret_key: Optional[str] = None
+    attachment_timeout: float = 5.0
+    ban_sweep_interval: float = 300.0
+    cooldown_state_path: Optional[str] = None
+    log_level: str = "INFO"
+    metrics_host: str = "127.0.0.1"
+    metrics_port: Optional[int] = None
+    shard_count: Optional[int] = None
+    shard_ids: Optional[List[int]] = None
+    state_store_url: Optional[str] = None
+    outbound_concurrency: int = 4
+    duplicate_window: float = 600.0
+    duplicate_distance: int = 6
+    duplicate_window_size: int = 2048
 
     @property
     def db_url(self):
+        if self.database_url:
+            return self.database_url
         return f"sqlite:///{self.db_path}"
 
+    @property
+    def sync_db_url(self):
+        """Same as db_url, but with a driver SQLAlchemy can use (for Alembic)."""
+        return ASYNC_DRIVER_RE.sub(r"\g<dialect>://", self.db_url)
+
 
 with open("config.json", "r") as f:
     config = Config.from_dict(json.load(f))
@@ -0,0 +1,104 @@
+import asyncio
+import sys
+import time
+import traceback
+from datetime import datetime
+from typing import Callable, Optional
+
+import sqlalchemy
+
+from pacilfess_discord.helper.database import database
+from pacilfess_discord.helper.state import StateStore
+from pacilfess_discord.helper.writer import writer
+from pacilfess_discord.models import BannedUser
+
+
+class BanManager:
+    """Keeps active bans in the state store so checking one needs no query.
+
+    The database stays the record of bans, a background task periodically
+    drops the expired ones from the store and from the database in one batch."""
+
+    def __init__(self, store: StateStore, sweep_interval: float):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    async def load(self, owns: Callable[[int], bool] = lambda _: True):
+        """Loads every active ban in owned guilds, called on startup."""
+        table = BannedUser.Meta.table
+        query = sqlalchemy.select(
+            [table.c.user_id, table.c.server_id, table.c.timeout]
+        ).where(table.c.timeout > int(time.time()))
+
+        bans = [
+            (row["user_id"], row["server_id"], row["timeout"])
+            async for row in database.iterate(query)
+            if owns(row["server_id"])
+        ]
+        await self.store.set_bans(bans)
+
+    async def check_banned(self, user_id: str, server_id: int) -> Optional[datetime]:
+        """Returns when the user's ban ends, or None if not banned."""
+        timeout = await self.store.get_ban(user_id, server_id)
+        if timeout is None:
+            return None
+        return datetime.fromtimestamp(timeout)
+
+    async def ban(self, user_id: str, server_id: int, timeout: float):
+        timeout = int(timeout)
+
+        async def write():
+            # Remove existing ban, expired or not, there can only be one per user.
+            await BannedUser.objects.filter(
+                user_id=user_id, server_id=server_id
+            ).delete()
+            await BannedUser.objects.create(
+                user_id=user_id,
+                server_id=server_id,
+                timeout=timeout,
+            )
+
+        await writer.submit(write)
+        await self.store.set_bans([(user_id, server_id, timeout)])
+
+    async def unban(self, user_id: str, server_id: int) -> bool:
+        """Lifts a ban, returns False if the user was not banned."""
+        if not await self.check_banned(user_id, server_id):
+            return False
+
+        await writer.submit(
+            BannedUser.objects.filter(user_id=user_id, server_id=server_id).delete
+        )
+        await self.store.remove_ban(user_id, server_id)
+        return True
+
+    async def sweep(self):
+        now = int(time.time())
+        await self.store.expire_bans(now)
+        await writer.submit(BannedUser.objects.filter(timeout__lt=now).delete)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as exc:
+                traceback.print_exception(
+                    type(exc), exc, exc.__traceback__, file=sys.stderr
+                )
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._sweep_forever())
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
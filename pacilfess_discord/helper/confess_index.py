@@ -0,0 +1,48 @@
+from typing import Callable, Dict, Optional
+
+import sqlalchemy
+
+from pacilfess_discord.helper.database import database
+from pacilfess_discord.models import Confess
+
+
+class ConfessionIndex:
+    """In-memory live confession message IDs per guild, with their channel.
+
+    Lets reaction events on unrelated messages be dropped without a query.
+    It has to be updated on every confess and every delete path."""
+
+    def __init__(self):
+        # Message ID to channel ID, None for rows from before channel_id.
+        self._messages: Dict[int, Dict[int, Optional[int]]] = {}
+
+    async def load(self, owns: Callable[[int], bool] = lambda _: True):
+        """Builds the index for owned guilds from the database, on startup."""
+        table = Confess.Meta.table
+        query = sqlalchemy.select(
+            [table.c.server_id, table.c.message_id, table.c.channel_id]
+        )
+
+        self._messages = {}
+        async for row in database.iterate(query):
+            if owns(row["server_id"]):
+                self.add(row["server_id"], row["message_id"], row["channel_id"])
+
+    def add(self, server_id: int, message_id: int, channel_id: Optional[int]):
+        self._messages.setdefault(server_id, {})[message_id] = channel_id
+
+    def discard(self, server_id: int, message_id: int):
+        messages = self._messages.get(server_id)
+        if messages is not None:
+            messages.pop(message_id, None)
+
+    def contains(self, server_id: int, message_id: int) -> bool:
+        messages = self._messages.get(server_id)
+        return messages is not None and message_id in messages
+
+    def channel(self, server_id: int, message_id: int) -> Optional[int]:
+        """The channel a confession was sent to, None if it is not known."""
+        return self._messages.get(server_id, {}).get(message_id)
+
+    def __len__(self):
+        return sum(len(x) for x in self._messages.values())
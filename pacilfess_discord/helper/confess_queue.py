@@ -0,0 +1,132 @@
+import asyncio
+import sys
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+from pacilfess_discord.helper.queries import AnyConfess
+from pacilfess_discord.helper.writer import writer
+from pacilfess_discord.models import Confess
+
+MessageKey = Tuple[int, int]
+
+
+class ConfessionQueue:
+    """Write-behind buffer for new confessions.
+
+    Confessions are acknowledged as soon as they are queued and inserted
+    with bulk_create once `max_rows` are waiting or `max_delay` seconds have
+    passed. Until then they are only in memory, so every lookup has to check
+    get()/latest_by() here before the database."""
+
+    def __init__(self, max_rows: int = 50, max_delay: float = 0.5):
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._pending: Dict[MessageKey, Confess] = {}
+        self._buffer: List[Confess] = []
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: "Optional[asyncio.Task[None]]" = None
+
+    def add(self, confess: Confess):
+        self._pending[(confess.server_id, confess.message_id)] = confess
+        self._buffer.append(confess)
+        if len(self._buffer) >= self.max_rows:
+            self._full.set()
+        self._wake.set()
+
+    def get(self, server_id: int, message_id: int) -> Optional[Confess]:
+        return self._pending.get((server_id, message_id))
+
+    def latest_by(
+        self, server_id: int, user_id: str, since: float
+    ) -> Optional[Confess]:
+        """Latest queued confession of a user sent after `since`."""
+        latest = None
+        for confess in self._pending.values():
+            if (
+                confess.server_id == server_id
+                and confess.user_id == user_id
+                and confess.sendtime > since
+                and (latest is None or confess.sendtime > latest.sendtime)
+            ):
+                latest = confess
+        return latest
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def _insert(self, batch: List[Confess]):
+        try:
+            await writer.submit(lambda: Confess.objects.bulk_create(batch))
+            return
+        except Exception as exc:
+            traceback.print_exception(
+                type(exc), exc, exc.__traceback__, file=sys.stderr
+            )
+
+        # Do not lose the whole batch over one bad row.
+        for confess in batch:
+            try:
+                await writer.submit(confess.save)
+            except Exception as exc:
+                traceback.print_exception(
+                    type(exc), exc, exc.__traceback__, file=sys.stderr
+                )
+
+    async def flush(self):
+        async with self._lock:
+            if not self._buffer:
+                return
+
+            batch, self._buffer = self._buffer, []
+            await self._insert(batch)
+            for confess in batch:
+                self._pending.pop((confess.server_id, confess.message_id), None)
+
+    async def delete(self, confess: AnyConfess):
+        """Deletes a confession, whether it has been written yet or not."""
+        key = (confess.server_id, confess.message_id)
+        # Waits for a flush in progress, anything still pending after that
+        # has not been written and can just be dropped.
+        async with self._lock:
+            pending = self._pending.pop(key, None)
+            if pending is not None:
+                self._buffer.remove(pending)
+                return
+
+        # Rows from bulk_create have no primary key, so go by message instead.
+        await writer.submit(
+            Confess.objects.filter(
+                server_id=confess.server_id, message_id=confess.message_id
+            ).delete
+        )
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wake.clear()
+            self._full.clear()
+            # Shielded, so stopping never interrupts a batch halfway.
+            await asyncio.shield(self.flush())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stops the background flush and writes out whatever is left."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
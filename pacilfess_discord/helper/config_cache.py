@@ -0,0 +1,55 @@
+from typing import Callable, Dict, Optional
+
+from pacilfess_discord.helper.writer import writer
+from pacilfess_discord.models import ServerConfig
+
+
+class ConfigCache:
+    """Write-through, per-guild cache of ServerConfig rows.
+
+    The config only changes through the Config cog, so everything else can
+    read it from memory. Every write must go through save() (or get_or_create())
+    so the cache never drifts from the database."""
+
+    def __init__(self):
+        self._configs: Dict[int, Optional[ServerConfig]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def load(self, owns: Callable[[int], bool] = lambda _: True):
+        """Fill the cache with the stored configs of owned guilds, on startup."""
+        self._configs = {
+            conf.server_id: conf
+            for conf in await ServerConfig.objects.all()
+            if owns(conf.server_id)
+        }
+
+    async def get(self, server_id: int) -> Optional[ServerConfig]:
+        if server_id in self._configs:
+            self.hits += 1
+            return self._configs[server_id]
+
+        self.misses += 1
+        server_conf = await ServerConfig.objects.get_or_none(server_id=server_id)
+        # Unconfigured servers are remembered too, so they stay cheap.
+        self._configs[server_id] = server_conf
+        return server_conf
+
+    async def get_or_create(self, server_id: int) -> ServerConfig:
+        server_conf = await self.get(server_id)
+        if server_conf is not None:
+            return server_conf
+
+        created: ServerConfig = await writer.submit(
+            lambda: ServerConfig.objects.create(server_id=server_id)
+        )
+        self._configs[server_id] = created
+        return created
+
+    async def save(self, server_conf: ServerConfig):
+        await writer.submit(server_conf.update)
+        self._configs[server_conf.server_id] = server_conf
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._configs), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,76 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class CooldownTracker:
+    """Per-guild confession cooldowns that forget users once they expire.
+
+    Each guild keeps an ordered dict of user -> monotonic time of their last
+    confession. Users are only added once their previous entry has expired,
+    so the dict stays in time order and expired users can be evicted from
+    the front. Memory is bounded by the users seen within one cooldown."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._guilds: Dict[int, "OrderedDict[str, float]"] = {}
+
+    @staticmethod
+    def _evict(entries: "OrderedDict[str, float]", now: float, cooldown: float):
+        while entries:
+            last_time = next(iter(entries.values()))
+            if now - last_time < cooldown:
+                break
+            entries.popitem(last=False)
+
+    def hit(self, server_id: int, user_id: str, cooldown: float) -> Optional[float]:
+        """Records a confession, returns the seconds left if still in cooldown."""
+        if cooldown <= 0:
+            self._guilds.pop(server_id, None)
+            return None
+
+        now = self._clock()
+        entries = self._guilds.setdefault(server_id, OrderedDict())
+        self._evict(entries, now, cooldown)
+
+        last_time = entries.get(user_id)
+        if last_time is not None:
+            return cooldown - (now - last_time)
+
+        entries[user_id] = now
+        return None
+
+    def __len__(self):
+        return sum(len(x) for x in self._guilds.values())
+
+    def save(self, path: str):
+        """Writes the state to a file as wall-clock times."""
+        offset = time.time() - self._clock()
+        data = {
+            server_id: {user: last + offset for user, last in entries.items()}
+            for server_id, entries in self._guilds.items()
+            if entries
+        }
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    def load(self, path: str, owns: Callable[[int], bool] = lambda _: True):
+        if not os.path.exists(path):
+            return
+
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        offset = time.time() - self._clock()
+        self._guilds = {
+            int(server_id): OrderedDict(
+                sorted(
+                    ((user, last - offset) for user, last in entries.items()),
+                    key=lambda x: x[1],
+                )
+            )
+            for server_id, entries in data.items()
+            if owns(int(server_id))
+        }
@@ -1,7 +1,97 @@
+import re
+import sqlite3
+from typing import Any, Union
+
 import databases
 import sqlalchemy
+from sqlalchemy.sql.elements import ClauseElement, TextClause
 
 from pacilfess_discord.config import config
+from pacilfess_discord.helper.metrics import db_query_seconds
+
+Query = Union[ClauseElement, str]
+
+TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+is_sqlite = config.db_url.startswith("sqlite")
+
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size={config.sqlite_cache_size}",
+    f"PRAGMA mmap_size={config.sqlite_mmap_size}",
+]
+
+
+class TunedConnection(sqlite3.Connection):
+    """sqlite3 connection that applies SQLITE_PRAGMAS when it is opened.
+
+    databases opens a new connection per task, so the pragmas that only last
+    for one connection have to be set on every one of them."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for pragma in SQLITE_PRAGMAS:
+            self.execute(pragma)
+
+
+def _operation(query: Query) -> str:
+    """Short label for a query, like "select confessions"."""
+    if isinstance(query, TextClause):
+        query = query.text
+    if isinstance(query, str):
+        words = query.split(None, 1)
+        if not words:
+            return "unknown"
+        table = TABLE_RE.search(query)
+        return f"{words[0].lower()} {table.group(1)}" if table else words[0].lower()
+
+    table = getattr(query, "table", None)
+    if table is None:
+        froms = getattr(query, "froms", None)
+        table = froms[0] if froms else None
+    return f"{query.__visit_name__} {getattr(table, 'name', '')}".strip()
+
+
+class InstrumentedDatabase(databases.Database):
+    """Database that records how long every call takes in the metrics."""
+
+    async def execute(self, query: Query, values: dict = None) -> Any:
+        with db_query_seconds.time(_operation(query)):
+            return await super().execute(query, values)
+
+    async def execute_many(self, query: Query, values: list) -> None:
+        with db_query_seconds.time(_operation(query)):
+            return await super().execute_many(query, values)
+
+    async def fetch_all(self, query: Query, values: dict = None) -> Any:
+        with db_query_seconds.time(_operation(query)):
+            return await super().fetch_all(query, values)
+
+    async def fetch_one(self, query: Query, values: dict = None) -> Any:
+        with db_query_seconds.time(_operation(query)):
+            return await super().fetch_one(query, values)
+
+    async def fetch_val(
+        self, query: Query, values: dict = None, column: Any = 0
+    ) -> Any:
+        with db_query_seconds.time(_operation(query)):
+            return await super().fetch_val(query, values, column=column)
+
 
-database = databases.Database(config.db_url)
+if is_sqlite:
+    if config.sqlite_tuning:
+        database = InstrumentedDatabase(
+            config.db_url,
+            factory=TunedConnection,
+            timeout=config.sqlite_busy_timeout,
+        )
+    else:
+        database = InstrumentedDatabase(config.db_url)
+else:
+    database = InstrumentedDatabase(
+        config.db_url,
+        min_size=config.db_pool_min_size,
+        max_size=config.db_pool_max_size,
+    )
 metadata = sqlalchemy.MetaData()
@@ -0,0 +1,108 @@
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+from pacilfess_discord.helper.word_filter import WordFilter, normalize
+from pacilfess_discord.helper.writer import writer
+from pacilfess_discord.models import FilterPattern, ServerConfig
+
+
+class FilterCache:
+    """Per-guild word filter entries and their compiled WordFilter.
+
+    The entries are kept in memory like ConfigCache does for the config, and
+    only change through add() and remove(). The compiled filter is built in an
+    executor on first use after a change, everything else reuses it."""
+
+    def __init__(self):
+        self._entries: Dict[int, List[FilterPattern]] = {}
+        self._compiled: Dict[int, "asyncio.Future[Optional[WordFilter]]"] = {}
+
+    async def load(self, owns: Callable[[int], bool] = lambda _: True):
+        """Fill the cache with the filters of owned guilds, on startup."""
+        self._entries = {}
+        self._compiled = {}
+        for entry in await FilterPattern.objects.all():
+            server_id = entry.server.server_id  # type: ignore
+            if owns(server_id):
+                self._entries.setdefault(server_id, []).append(entry)
+
+    async def entries(self, server_id: int) -> List[FilterPattern]:
+        if server_id not in self._entries:
+            # Guilds without filters are remembered too, so they stay cheap.
+            self._entries[server_id] = await FilterPattern.objects.filter(
+                server=server_id
+            ).all()
+        return self._entries[server_id]
+
+    @staticmethod
+    def _build(entries: List[FilterPattern]) -> Optional[WordFilter]:
+        if not entries:
+            return None
+        return WordFilter(
+            (x.pattern for x in entries if not x.is_regex),
+            (x.pattern for x in entries if x.is_regex),
+        )
+
+    async def get(self, server_id: int) -> Optional[WordFilter]:
+        """The guild's compiled filter, None if it has no entries."""
+        compiled = self._compiled.get(server_id)
+        if compiled is None:
+            entries = list(await self.entries(server_id))
+            building = asyncio.ensure_future(
+                asyncio.get_event_loop().run_in_executor(None, self._build, entries)
+            )
+            self._compiled[server_id] = compiled = building
+
+        try:
+            return await asyncio.shield(compiled)
+        except Exception:
+            if self._compiled.get(server_id) is compiled:
+                del self._compiled[server_id]
+            raise
+
+    async def add(
+        self, server_conf: ServerConfig, patterns: List[str], is_regex: bool
+    ) -> List[str]:
+        """Adds entries to a guild's filter, returns the ones that were new."""
+        entries = await self.entries(server_conf.server_id)
+        # Terms are stored normalized, regex patterns as they are.
+        existing = {x.pattern for x in entries if x.is_regex == is_regex}
+
+        new: List[FilterPattern] = []
+        for pattern in patterns:
+            key = pattern if is_regex else normalize(pattern)
+            if key and key not in existing:
+                existing.add(key)
+                new.append(
+                    FilterPattern(server=server_conf, pattern=key, is_regex=is_regex)
+                )
+        if not new:
+            return []
+
+        await writer.submit(lambda: FilterPattern.objects.bulk_create(new))
+        entries.extend(new)
+        self._compiled.pop(server_conf.server_id, None)
+        return [x.pattern for x in new]
+
+    async def remove(self, server_id: int, pattern: str) -> bool:
+        """Removes a term or pattern, returns False if there was none."""
+        term = normalize(pattern)
+        entries = await self.entries(server_id)
+        removed = [x for x in entries if x.pattern == (pattern if x.is_regex else term)]
+        if not removed:
+            return False
+
+        async def delete():
+            # Rows from bulk_create have no primary key, so go by pattern.
+            for is_regex in (False, True):
+                patterns = [x.pattern for x in removed if x.is_regex == is_regex]
+                if patterns:
+                    await FilterPattern.objects.filter(
+                        server=server_id, is_regex=is_regex, pattern__in=patterns
+                    ).delete()
+
+        await writer.submit(delete)
+        removed_ids = {id(x) for x in removed}
+        self._entries[server_id] = [x for x in entries if id(x) not in removed_ids]
+        self._compiled.pop(server_id, None)
+        return True
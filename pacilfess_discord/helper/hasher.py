@@ -1,7 +1,10 @@
+import asyncio
+import os
 import random
 from base64 import b64decode, b64encode
-from hashlib import sha256
-from typing import Type, TypeVar, cast
+from functools import lru_cache
+from hashlib import blake2b, sha256
+from typing import Optional, Type, TypeVar, cast
 
 import discord
 from Crypto.Cipher import Salsa20
@@ -12,17 +15,76 @@ from pacilfess_discord.config import config
 
 T = TypeVar("T", bound=DataClassJsonMixin)
 
-random.seed("pacilfess-dc")
-salt = random.randbytes(32)
-key = cast(bytes, scrypt(config.secret, salt, 16, N=2 ** 14, r=8, p=1))  # type: ignore
+KEY_ENV = "PACILFESS_SECRET_KEY"
+LEGACY_HASH_LENGTH = 64
+
+_hash_key = blake2b(
+    config.secret.encode(), digest_size=32, person=b"pacilfess-user"
+).digest()
+
+_key: "Optional[asyncio.Future[bytes]]" = None
+
+
+def _precomputed_key() -> Optional[bytes]:
+    key_hex = config.secret_key or os.environ.get(KEY_ENV)
+    if key_hex:
+        return bytes.fromhex(key_hex)
+    return None
+
+
+def derive_key() -> bytes:
+    """Derives the encryption key from config.secret, takes a while."""
+    salt = random.Random("pacilfess-dc").randbytes(32)
+    return cast(bytes, scrypt(config.secret, salt, 16, N=2 ** 14, r=8, p=1))  # type: ignore
+
+
+async def get_key() -> bytes:
+    """Returns the encryption key, deriving it in an executor on first use.
+
+    Set `secret_key` in the config or the PACILFESS_SECRET_KEY environment
+    variable to the output of `python -m pacilfess_discord.helper.hasher`
+    to skip the derivation entirely."""
+    global _key
+    if _key is None:
+        loop = asyncio.get_event_loop()
+        precomputed = _precomputed_key()
+        if precomputed:
+            _key = loop.create_future()
+            _key.set_result(precomputed)
+        else:
+            _key = asyncio.ensure_future(loop.run_in_executor(None, derive_key))
+
+    try:
+        return await asyncio.shield(_key)
+    except Exception:
+        _key = None
+        raise
+
+
+def _keyed_hash(legacy_hash: str) -> str:
+    return blake2b(legacy_hash.encode(), key=_hash_key, digest_size=24).hexdigest()
+
+
+@lru_cache(maxsize=4096)
+def _hash_id(user_id: int) -> str:
+    # Keyed on top of the old unsalted digest, so stored hashes can be
+    # converted with upgrade_hash() without knowing the user IDs.
+    return _keyed_hash(sha256(str(user_id).encode()).hexdigest())
 
 
 def hash_user(user: discord.Member):
-    return sha256(str(user.id).encode()).hexdigest()
+    return _hash_id(user.id)
 
 
-def enc_data(obj: DataClassJsonMixin):
-    cipher = Salsa20.new(key)
+def upgrade_hash(user_hash: str) -> str:
+    """Converts an unkeyed hash from older versions, newer ones are returned as is."""
+    if len(user_hash) == LEGACY_HASH_LENGTH:
+        return _keyed_hash(user_hash)
+    return user_hash
+
+
+async def enc_data(obj: DataClassJsonMixin):
+    cipher = Salsa20.new(await get_key())
     encrypted_data = cipher.encrypt(obj.to_json().encode())
     assert isinstance(encrypted_data, bytes)
 
@@ -30,9 +92,13 @@ def enc_data(obj: DataClassJsonMixin):
     return b64encode(bytes(output_data))
 
 
-def decrypt_data(enc: str, cls: Type[T]) -> T:
+async def decrypt_data(enc: str, cls: Type[T]) -> T:
     decoded_data = b64decode(enc)
 
-    cipher = Salsa20.new(key, nonce=decoded_data[:8])
+    cipher = Salsa20.new(await get_key(), nonce=decoded_data[:8])
     output = cipher.decrypt(decoded_data[8:])
     return cls.from_json(output)
+
+
+if __name__ == "__main__":
+    print(derive_key().hex())
@@ -0,0 +1,206 @@
+import functools
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        """The metric's samples in the Prometheus text format, one per line."""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, labels)} {value}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    """Gauge whose value is read from a callback when scraped."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Callable[[], float]):
+        super().__init__(name, help)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return [f"{self.name} {self.callback()}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Per label values: [count per bucket..., count above the last], sum.
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def timed(self, *labels: str) -> Callable[[F], F]:
+        """Decorator timing every call of a coroutine function."""
+
+        def decorator(func: F) -> F:
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, *labels)
+
+            return wrapper  # type: ignore
+
+        return decorator
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labels + ("le",), labels + (le,))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+
+            label_str = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{label_str} {total[0]}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))  # type: ignore
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, help, labels))  # type: ignore
+
+    def gauge(self, name: str, help: str, callback: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, help, callback))  # type: ignore
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+command_seconds = registry.histogram(
+    "pacilfess_command_seconds", "Time spent handling a command.", ["command"]
+)
+db_query_seconds = registry.histogram(
+    "pacilfess_db_query_seconds", "Time spent on a database call.", ["operation"]
+)
+discord_request_seconds = registry.histogram(
+    "pacilfess_discord_request_seconds",
+    "Time spent on a Discord REST call, rate limit waits included.",
+    ["method", "route"],
+)
+event_seconds = registry.histogram(
+    "pacilfess_event_seconds", "Time spent in a gateway event handler.", ["event"]
+)
+discord_queue_wait_seconds = registry.histogram(
+    "pacilfess_discord_queue_wait_seconds",
+    "Time a Discord REST call waited in the outbound queue.",
+    ["priority"],
+)
+discord_requests_merged_total = registry.counter(
+    "pacilfess_discord_requests_merged_total",
+    "Discord REST calls merged into a call already queued.",
+    ["priority"],
+)
+votes_total = registry.counter("pacilfess_votes_total", "Deletion votes counted.")
+deletions_total = registry.counter(
+    "pacilfess_deletions_total", "Confessions deleted.", ["reason"]
+)
+mutes_total = registry.counter("pacilfess_mutes_total", "Users muted.")
+rejections_total = registry.counter(
+    "pacilfess_rejections_total", "Confessions rejected before sending.", ["reason"]
+)
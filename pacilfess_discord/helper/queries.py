@@ -0,0 +1,143 @@
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+import sqlalchemy
+
+from pacilfess_discord.helper.database import database, is_sqlite
+from pacilfess_discord.models import Confess
+
+
+class ConfessRecord(NamedTuple):
+    """Read-only row of the confessions table.
+
+    The hot read paths return these instead of ormar models, which are
+    validated by pydantic on every construction. Writes, and anything else
+    that is not hot, keep using the models."""
+
+    id: Optional[int]
+    server_id: int
+    message_id: int
+    channel_id: Optional[int]
+    user_id: str
+    content: str
+    sendtime: int
+    attachment: Optional[str]
+
+
+AnyConfess = Union[Confess, ConfessRecord]
+
+_COLUMNS = ", ".join(ConfessRecord._fields)
+
+# Built once, only the values are bound per call.
+CONFESS_EXISTS = sqlalchemy.text(
+    "SELECT 1 FROM confessions"
+    " WHERE server_id = :server_id AND message_id = :message_id LIMIT 1"
+)
+CONFESS_BY_MESSAGE = sqlalchemy.text(
+    f"SELECT {_COLUMNS} FROM confessions"
+    " WHERE server_id = :server_id AND message_id = :message_id LIMIT 1"
+)
+CONFESS_BY_AUTHOR_MESSAGE = sqlalchemy.text(
+    f"SELECT {_COLUMNS} FROM confessions"
+    " WHERE server_id = :server_id AND message_id = :message_id"
+    " AND user_id = :user_id AND sendtime > :since LIMIT 1"
+)
+LATEST_CONFESS_BY_AUTHOR = sqlalchemy.text(
+    f"SELECT {_COLUMNS} FROM confessions"
+    " WHERE server_id = :server_id AND user_id = :user_id AND sendtime > :since"
+    " ORDER BY sendtime DESC LIMIT 1"
+)
+
+# Newest first. On SQLite the FTS index is walked in rowid order, so the
+# search stops as soon as a page is full.
+if is_sqlite:
+    SEARCH_CONFESS = sqlalchemy.text(
+        f"SELECT {', '.join('c.' + name for name in ConfessRecord._fields)}"
+        " FROM confessions_fts JOIN confessions c ON c.id = confessions_fts.rowid"
+        " WHERE confessions_fts MATCH :query AND c.server_id = :server_id"
+        " ORDER BY confessions_fts.rowid DESC LIMIT :limit OFFSET :offset"
+    )
+else:
+    SEARCH_CONFESS = sqlalchemy.text(
+        f"SELECT {_COLUMNS} FROM confessions WHERE server_id = :server_id"
+        " AND content_tsv @@ to_tsquery('simple', :query)"
+        " ORDER BY id DESC LIMIT :limit OFFSET :offset"
+    )
+
+
+def _record(row) -> Optional[ConfessRecord]:
+    if row is None:
+        return None
+    return ConfessRecord(*(row[name] for name in ConfessRecord._fields))
+
+
+async def confess_exists(server_id: int, message_id: int) -> bool:
+    query = CONFESS_EXISTS.bindparams(server_id=server_id, message_id=message_id)
+    return await database.fetch_val(query) is not None
+
+
+async def get_confess(server_id: int, message_id: int) -> Optional[ConfessRecord]:
+    query = CONFESS_BY_MESSAGE.bindparams(server_id=server_id, message_id=message_id)
+    return _record(await database.fetch_one(query))
+
+
+async def get_recent_confess(
+    server_id: int, user_id: str, since: int, message_id: Optional[int] = None
+) -> Optional[ConfessRecord]:
+    """The user's confession sent after `since`, the latest one without a message."""
+    if message_id is None:
+        query = LATEST_CONFESS_BY_AUTHOR.bindparams(
+            server_id=server_id, user_id=user_id, since=since
+        )
+    else:
+        query = CONFESS_BY_AUTHOR_MESSAGE.bindparams(
+            server_id=server_id, message_id=message_id, user_id=user_id, since=since
+        )
+    return _record(await database.fetch_one(query))
+
+
+def _search_terms(text: str) -> List[Tuple[str, bool]]:
+    """Words of a search and whether each one ends in `*`, a prefix match."""
+    terms = []
+    for word in text.split():
+        stripped = word.rstrip("*")
+        if stripped:
+            terms.append((stripped, stripped != word))
+    return terms
+
+
+def _fts_query(terms: List[Tuple[str, bool]]) -> str:
+    # Quoted, so nothing typed is taken as FTS5 query syntax.
+    return " ".join(
+        '"' + word.replace('"', '""') + '"' + ("*" if prefix else "")
+        for word, prefix in terms
+    )
+
+
+def _tsquery(terms: List[Tuple[str, bool]]) -> str:
+    return " & ".join(
+        "'"
+        + word.replace("\\", "\\\\").replace("'", "''")
+        + "'"
+        + (":*" if prefix else "")
+        for word, prefix in terms
+    )
+
+
+async def search_confess(
+    server_id: int, text: str, limit: int, offset: int = 0
+) -> List[ConfessRecord]:
+    """Confessions of a server containing every word of `text`, newest first."""
+    terms = _search_terms(text)
+    if not terms:
+        return []
+
+    query = _fts_query(terms) if is_sqlite else _tsquery(terms)
+
+    rows = await database.fetch_all(
+        SEARCH_CONFESS.bindparams(
+            server_id=server_id, query=query, limit=limit, offset=offset
+        )
+    )
+    return [
+        ConfessRecord(*(row[name] for name in ConfessRecord._fields)) for row in rows
+    ]
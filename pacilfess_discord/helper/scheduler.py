@@ -0,0 +1,187 @@
+import asyncio
+import functools
+import itertools
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from pacilfess_discord.helper.metrics import (
+    discord_queue_wait_seconds,
+    discord_requests_merged_total,
+)
+
+
+class Priority(IntEnum):
+    REPLY = 0
+    MODERATION = 1
+    LOG = 2
+
+
+class _Job:
+    __slots__ = (
+        "call",
+        "priority",
+        "merge_key",
+        "bucket",
+        "futures",
+        "queued_at",
+        "taken",
+    )
+
+    def __init__(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        priority: Priority,
+        merge_key: Optional[Hashable],
+        bucket: "_Bucket",
+    ):
+        self.call = call
+        self.priority = priority
+        self.merge_key = merge_key
+        self.bucket = bucket
+        self.futures: List["asyncio.Future[Any]"] = []
+        self.queued_at = time.perf_counter()
+        self.taken = False
+
+
+class _Bucket:
+    __slots__ = ("queue", "workers")
+
+    def __init__(self):
+        self.queue: "asyncio.PriorityQueue[Tuple[int, int, _Job]]" = (
+            asyncio.PriorityQueue()
+        )
+        self.workers = 0
+
+
+class RequestScheduler:
+    """Runs outbound Discord REST calls in priority order.
+
+    Replies run in place, right away, so an interaction is always
+    acknowledged in time. Other calls are queued per route bucket, usually
+    the channel they go to, with at most `concurrency` of them in flight per
+    bucket. A rate-limited channel then only holds up its own calls, and
+    moderation edits still go before log messages within a bucket. Calls
+    with the same merge key that are still waiting collapse into the latest
+    one, e.g. several edits of the same message.
+
+    When not started, every call runs in place."""
+
+    def __init__(self, concurrency: int = 4):
+        self.concurrency = concurrency
+        self._started = False
+        self._buckets: Dict[Hashable, _Bucket] = {}
+        self._waiting: Dict[Hashable, _Job] = {}
+        self._counter = itertools.count()
+        self._workers: Set["asyncio.Task[None]"] = set()
+
+    def __len__(self):
+        return sum(x.queue.qsize() for x in self._buckets.values())
+
+    async def run(
+        self,
+        priority: Priority,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        merge_key: Optional[Hashable] = None,
+        bucket: Hashable = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Schedules `func(*args, **kwargs)` and returns its result.
+
+        `bucket` is the route bucket the call counts against, calls without
+        one share a bucket."""
+        call = functools.partial(func, *args, **kwargs)
+        if not self._started or priority == Priority.REPLY:
+            return await call()
+
+        future = asyncio.get_event_loop().create_future()
+        job = self._waiting.get(merge_key) if merge_key is not None else None
+        if job is not None:
+            # Only the latest call runs, everyone waiting gets its result.
+            discord_requests_merged_total.inc(priority.name.lower())
+            job.call = call
+            job.futures.append(future)
+            if priority < job.priority:
+                job.priority = priority
+                job.bucket.queue.put_nowait((priority, next(self._counter), job))
+            return await future
+
+        queue = self._buckets.get(bucket)
+        if queue is None:
+            queue = self._buckets[bucket] = _Bucket()
+        job = _Job(call, priority, merge_key, queue)
+        job.futures.append(future)
+        if merge_key is not None:
+            self._waiting[merge_key] = job
+        queue.queue.put_nowait((priority, next(self._counter), job))
+        if queue.workers < self.concurrency:
+            queue.workers += 1
+            worker = asyncio.ensure_future(self._work(bucket, queue))
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+        return await future
+
+    @staticmethod
+    async def _run_job(job: _Job):
+        try:
+            result = await job.call()
+        except asyncio.CancelledError:
+            for future in job.futures:
+                future.cancel()
+            raise
+        except Exception as exc:
+            for future in job.futures:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for future in job.futures:
+                if not future.done():
+                    future.set_result(result)
+
+    def _take(self, job: _Job) -> bool:
+        # A promoted job is queued twice, only run it once.
+        if job.taken:
+            return False
+        job.taken = True
+        if job.merge_key is not None:
+            self._waiting.pop(job.merge_key, None)
+        return True
+
+    async def _work(self, key: Hashable, bucket: _Bucket):
+        # Workers only live while their bucket has calls waiting.
+        try:
+            while not bucket.queue.empty():
+                _, _, job = bucket.queue.get_nowait()
+                if not self._take(job):
+                    continue
+
+                discord_queue_wait_seconds.observe(
+                    time.perf_counter() - job.queued_at, job.priority.name.lower()
+                )
+                await self._run_job(job)
+        finally:
+            bucket.workers -= 1
+            if not bucket.workers and self._buckets.get(key) is bucket:
+                del self._buckets[key]
+
+    def start(self):
+        self._started = True
+
+    async def stop(self):
+        """Stops the workers, then runs whatever is still queued in place."""
+        if not self._started:
+            return
+        self._started = False
+
+        workers = list(self._workers)
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        buckets, self._buckets = self._buckets, {}
+        for bucket in buckets.values():
+            while not bucket.queue.empty():
+                _, _, job = bucket.queue.get_nowait()
+                if self._take(job):
+                    await self._run_job(job)
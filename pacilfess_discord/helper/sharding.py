@@ -0,0 +1,73 @@
+import os
+from typing import List, Optional, Sequence
+
+from pacilfess_discord.config import config
+
+SHARD_IDS_ENV = "PACILFESS_SHARD_IDS"
+
+
+def shard_for(guild_id: int, shard_count: int) -> int:
+    """The shard Discord routes a guild's events to."""
+    return (guild_id >> 22) % shard_count
+
+
+def parse_shard_ids(value: str) -> List[int]:
+    """Parses shard IDs like "0-3,8" into [0, 1, 2, 3, 8]."""
+    shard_ids: List[int] = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            shard_ids.extend(range(int(first), int(last) + 1))
+        else:
+            shard_ids.append(int(part))
+    return shard_ids
+
+
+class ShardRange:
+    """The shards handled by this process.
+
+    Every guild belongs to exactly one shard, so state loaded for the guilds
+    of this range never has to be shared with another process. Without a
+    shard count or with no explicit IDs, the process handles every guild."""
+
+    def __init__(
+        self,
+        shard_ids: Optional[Sequence[int]] = None,
+        shard_count: Optional[int] = None,
+    ):
+        self.shard_ids = sorted(set(shard_ids)) if shard_ids is not None else None
+        self.shard_count = shard_count
+        if self.shard_ids is not None and not self.shard_count:
+            raise ValueError("shard_count is required when shard_ids are given.")
+
+    @classmethod
+    def from_config(cls) -> "ShardRange":
+        """Reads the range from the config, PACILFESS_SHARD_IDS takes precedence."""
+        shard_ids = config.shard_ids
+        if os.environ.get(SHARD_IDS_ENV):
+            shard_ids = parse_shard_ids(os.environ[SHARD_IDS_ENV])
+        return cls(shard_ids, config.shard_count)
+
+    @property
+    def is_partial(self) -> bool:
+        return self.shard_ids is not None and self.shard_count is not None
+
+    def owns(self, guild_id: int) -> bool:
+        if not self.is_partial:
+            return True
+        return shard_for(guild_id, self.shard_count) in self.shard_ids  # type: ignore
+
+    def suffix(self, path: str) -> str:
+        """Makes a per-process file path, e.g. for the cooldown state."""
+        if not self.is_partial:
+            return path
+        ids = self.shard_ids or []
+        return f"{path}.shards-{ids[0]}-{ids[-1]}" if ids else path
+
+    def __repr__(self):
+        if not self.is_partial:
+            return "ShardRange(all)"
+        return f"ShardRange({self.shard_ids} of {self.shard_count})"
@@ -0,0 +1,174 @@
+import asyncio
+import re
+import time
+import unicodedata
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+SHINGLE_SIZE = 4
+# Lanes are 16 bits, longer texts are cut off.
+MAX_LENGTH = 65535
+# Shorter texts have too few shingles to tell apart reliably.
+MIN_LENGTH = 16
+
+NOISE_RE = re.compile(r"[\W_]+")
+
+# Per byte value, its bits spread into 16-bit lanes, one table per byte of a
+# 64-bit hash. Adding up the entries for every shingle counts the set bits
+# of all 64 positions at once in one big integer.
+_LANES = [
+    [
+        sum((value >> bit & 1) << (16 * (8 * byte + bit)) for bit in range(8))
+        for value in range(256)
+    ]
+    for byte in range(8)
+]
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of the character shingles of a normalized text.
+
+    Lightly edited copies of a text end up a few bits apart. Uses hash(), so
+    fingerprints only compare within one process. Returns None if the text is
+    too short to fingerprint."""
+    normalized = NOISE_RE.sub(
+        " ", unicodedata.normalize("NFKC", text).casefold()
+    ).strip()
+    if len(normalized) < MIN_LENGTH:
+        return None
+    normalized = normalized[:MAX_LENGTH]
+
+    counts = 0
+    lane0, lane1, lane2, lane3, lane4, lane5, lane6, lane7 = _LANES
+    shingles = len(normalized) - SHINGLE_SIZE + 1
+    for i in range(shingles):
+        shingle_hash = hash(normalized[i : i + SHINGLE_SIZE]) & 0xFFFFFFFFFFFFFFFF
+        b0, b1, b2, b3, b4, b5, b6, b7 = shingle_hash.to_bytes(8, "little")
+        counts += (
+            lane0[b0]
+            + lane1[b1]
+            + lane2[b2]
+            + lane3[b3]
+            + lane4[b4]
+            + lane5[b5]
+            + lane6[b6]
+            + lane7[b7]
+        )
+
+    half = shingles / 2
+    fingerprint = 0
+    for bit in range(64):
+        if counts >> (16 * bit) & 0xFFFF > half:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class _Window:
+    __slots__ = ("entries", "buckets")
+
+    def __init__(self):
+        # (monotonic time, fingerprint), oldest first.
+        self.entries: Deque[Tuple[float, int]] = deque()
+        # (band, band value) -> fingerprint -> times it is in the window.
+        self.buckets: Dict[Tuple[int, int], Dict[int, int]] = {}
+
+
+class DuplicateDetector:
+    """Per-guild index of recent confession fingerprints, to stop raids.
+
+    A fingerprint is split into `max_distance + 1` bands. Two fingerprints
+    at most `max_distance` bits apart always share a band, so a lookup only
+    compares against the few fingerprints in the same buckets instead of
+    the whole window.
+
+    Only fingerprints from the last `window` seconds are kept, at most
+    `max_size` per guild. Like the cooldowns, this lives in the process that
+    owns the guild."""
+
+    def __init__(
+        self,
+        window: float,
+        max_distance: int = 6,
+        max_size: int = 2048,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window = window
+        self.max_distance = max_distance
+        self.max_size = max_size
+        self._clock = clock
+        bands = max_distance + 1
+        bounds = [64 * i // bands for i in range(bands + 1)]
+        self._bands = [
+            (low, (1 << (high - low)) - 1) for low, high in zip(bounds, bounds[1:])
+        ]
+        self._guilds: Dict[int, _Window] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def fingerprint(self, text: str) -> Optional[int]:
+        """Fingerprints a text in an executor, off the event loop."""
+        if not self.enabled:
+            return None
+        return await asyncio.get_event_loop().run_in_executor(None, simhash, text)
+
+    def _keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        return [
+            (band, fingerprint >> shift & mask)
+            for band, (shift, mask) in enumerate(self._bands)
+        ]
+
+    def _remove(self, window: _Window, fingerprint: int):
+        for key in self._keys(fingerprint):
+            bucket = window.buckets[key]
+            if bucket[fingerprint] > 1:
+                bucket[fingerprint] -= 1
+            else:
+                del bucket[fingerprint]
+                if not bucket:
+                    del window.buckets[key]
+
+    def _evict(self, window: _Window, now: float):
+        entries = window.entries
+        while entries and (
+            now - entries[0][0] >= self.window or len(entries) >= self.max_size
+        ):
+            self._remove(window, entries.popleft()[1])
+
+    def seen(self, server_id: int, fingerprint: int) -> bool:
+        """Records a fingerprint, returns True if a near-duplicate is recent.
+
+        Duplicates are recorded as well, so a flood of copies stays blocked
+        for as long as it keeps coming."""
+        now = self._clock()
+        window = self._guilds.setdefault(server_id, _Window())
+        self._evict(window, now)
+
+        keys = self._keys(fingerprint)
+        duplicate = any(
+            bin(fingerprint ^ other).count("1") <= self.max_distance
+            for key in keys
+            for other in window.buckets.get(key, ())
+        )
+
+        window.entries.append((now, fingerprint))
+        for key in keys:
+            bucket = window.buckets.setdefault(key, {})
+            bucket[fingerprint] = bucket.get(fingerprint, 0) + 1
+        return duplicate
+
+    def forget(self, server_id: int, fingerprint: int):
+        """Drops the latest record of a fingerprint, e.g. if it was never sent."""
+        window = self._guilds.get(server_id)
+        if window is None:
+            return
+        entries = window.entries
+        for i in range(len(entries) - 1, -1, -1):
+            if entries[i][1] == fingerprint:
+                del entries[i]
+                self._remove(window, fingerprint)
+                return
+
+    def __len__(self):
+        return sum(len(x.entries) for x in self._guilds.values())
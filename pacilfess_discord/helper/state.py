@@ -0,0 +1,306 @@
+import heapq
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from pacilfess_discord.config import config
+from pacilfess_discord.helper.cooldown import CooldownTracker
+
+MessageKey = Tuple[int, int]
+BanKey = Tuple[str, int]
+
+# A claim outlives a crashed process for at most this long.
+CLAIM_TTL = 60
+# Vote counts of messages nobody voted on for this long are dropped.
+VOTE_TTL = 24 * 60 * 60
+
+
+class ConfessCheck(NamedTuple):
+    banned_until: Optional[float]
+    cooldown_left: Optional[float]
+
+
+class StateStore(ABC):
+    """Cooldowns, active bans and vote counts.
+
+    The database stays the record of bans, this is what is checked on every
+    confession and reaction. With more than one bot process, all of them must
+    use the same shared store."""
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def load_cooldowns(self, path: str, owns: Callable[[int], bool]):
+        pass
+
+    def save_cooldowns(self, path: str):
+        pass
+
+    @abstractmethod
+    async def check_confess(
+        self, server_id: int, user_id: str, cooldown: float
+    ) -> ConfessCheck:
+        """Looks up the user's ban and records a cooldown hit, in one round-trip.
+
+        `cooldown_left` is only set if the user is still in cooldown."""
+
+    @abstractmethod
+    async def get_ban(self, user_id: str, server_id: int) -> Optional[float]:
+        """Returns the timestamp the user's ban ends at, if banned."""
+
+    @abstractmethod
+    async def set_bans(self, bans: Iterable[Tuple[str, int, float]]):
+        """Stores (user, server, timeout) bans, replacing existing ones."""
+
+    @abstractmethod
+    async def remove_ban(self, user_id: str, server_id: int):
+        pass
+
+    @abstractmethod
+    async def expire_bans(self, now: float):
+        pass
+
+    @abstractmethod
+    async def seed_votes(self, server_id: int, message_id: int, count: int) -> int:
+        """Sets the vote count unless one is stored, returns the stored count."""
+
+    @abstractmethod
+    async def add_vote(
+        self, server_id: int, message_id: int, amount: int = 1
+    ) -> Optional[int]:
+        """Changes the vote count, returns None if it was never seeded."""
+
+    @abstractmethod
+    async def claim(self, server_id: int, message_id: int) -> bool:
+        """Marks a message as being deleted, returns False if already taken."""
+
+    @abstractmethod
+    async def release(self, server_id: int, message_id: int):
+        pass
+
+    @abstractmethod
+    async def forget(self, server_id: int, message_id: int):
+        pass
+
+
+class LocalStateStore(StateStore):
+    """Keeps everything in this process, for running a single bot process.
+
+    Active bans are ordered by timeout in a heap so expired ones can be
+    dropped cheaply, only the most recently used `max_votes` messages are
+    kept, an evicted message is simply seeded again on its next vote."""
+
+    def __init__(self, max_votes: int = 4096):
+        self.max_votes = max_votes
+        self.cooldowns = CooldownTracker()
+        self._bans: Dict[BanKey, float] = {}
+        self._expiry: List[Tuple[float, str, int]] = []
+        self._votes: "OrderedDict[MessageKey, int]" = OrderedDict()
+        self._claimed: Set[MessageKey] = set()
+
+    def load_cooldowns(self, path: str, owns: Callable[[int], bool]):
+        self.cooldowns.load(path, owns)
+
+    def save_cooldowns(self, path: str):
+        self.cooldowns.save(path)
+
+    def _get_ban(self, user_id: str, server_id: int) -> Optional[float]:
+        timeout = self._bans.get((user_id, server_id))
+        if timeout is None or timeout <= time.time():
+            return None
+        return timeout
+
+    async def check_confess(
+        self, server_id: int, user_id: str, cooldown: float
+    ) -> ConfessCheck:
+        return ConfessCheck(
+            self._get_ban(user_id, server_id),
+            self.cooldowns.hit(server_id, user_id, cooldown),
+        )
+
+    async def get_ban(self, user_id: str, server_id: int) -> Optional[float]:
+        return self._get_ban(user_id, server_id)
+
+    async def set_bans(self, bans: Iterable[Tuple[str, int, float]]):
+        for user_id, server_id, timeout in bans:
+            self._bans[(user_id, server_id)] = timeout
+            heapq.heappush(self._expiry, (timeout, user_id, server_id))
+
+    async def remove_ban(self, user_id: str, server_id: int):
+        self._bans.pop((user_id, server_id), None)
+
+    async def expire_bans(self, now: float):
+        while self._expiry and self._expiry[0][0] <= now:
+            timeout, user_id, server_id = heapq.heappop(self._expiry)
+            # The ban might have been replaced or lifted since it was pushed.
+            if self._bans.get((user_id, server_id)) == timeout:
+                del self._bans[(user_id, server_id)]
+
+    def _store_votes(self, key: MessageKey, count: int) -> int:
+        self._votes[key] = max(count, 0)
+        self._votes.move_to_end(key)
+        while len(self._votes) > self.max_votes:
+            self._votes.popitem(last=False)
+        return self._votes[key]
+
+    async def seed_votes(self, server_id: int, message_id: int, count: int) -> int:
+        key = (server_id, message_id)
+        if key in self._votes:
+            return self._votes[key]
+        return self._store_votes(key, count)
+
+    async def add_vote(
+        self, server_id: int, message_id: int, amount: int = 1
+    ) -> Optional[int]:
+        key = (server_id, message_id)
+        if key not in self._votes:
+            return None
+        return self._store_votes(key, self._votes[key] + amount)
+
+    async def claim(self, server_id: int, message_id: int) -> bool:
+        key = (server_id, message_id)
+        if key in self._claimed:
+            return False
+        self._claimed.add(key)
+        return True
+
+    async def release(self, server_id: int, message_id: int):
+        self._claimed.discard((server_id, message_id))
+
+    async def forget(self, server_id: int, message_id: int):
+        key = (server_id, message_id)
+        self._votes.pop(key, None)
+        self._claimed.discard(key)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cooldowns": len(self.cooldowns),
+            "bans": len(self._bans),
+            "votes": len(self._votes),
+        }
+
+
+SEED_VOTES = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return tonumber(ARGV[1])
+end
+return tonumber(redis.call('GET', KEYS[1]))
+"""
+
+ADD_VOTE = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local count = redis.call('INCRBY', KEYS[1], ARGV[1])
+if count < 0 then
+    redis.call('INCRBY', KEYS[1], -count)
+    count = 0
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return count
+"""
+
+
+class RedisStateStore(StateStore):
+    """Shares the state between bot processes through Redis.
+
+    Bans and cooldowns are keys that expire by themselves. Needs the `redis`
+    extra (aioredis)."""
+
+    def __init__(self, url: str, prefix: str = "pacilfess"):
+        self.url = url
+        self.prefix = prefix
+        self._redis: Any = None
+        self._seed_votes: Any = None
+        self._add_vote: Any = None
+
+    async def connect(self):
+        import aioredis
+
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        self._seed_votes = self._redis.register_script(SEED_VOTES)
+        self._add_vote = self._redis.register_script(ADD_VOTE)
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def _key(self, kind: str, server_id: int, member: Any) -> str:
+        return f"{self.prefix}:{kind}:{server_id}:{member}"
+
+    async def check_confess(
+        self, server_id: int, user_id: str, cooldown: float
+    ) -> ConfessCheck:
+        cooldown_key = self._key("cooldown", server_id, user_id)
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.get(self._key("ban", server_id, user_id))
+        if cooldown > 0:
+            pipe.set(cooldown_key, 1, px=int(cooldown * 1000), nx=True)
+            pipe.pttl(cooldown_key)
+        results = await pipe.execute()
+
+        banned_until = None
+        if results[0] is not None and float(results[0]) > time.time():
+            banned_until = float(results[0])
+
+        cooldown_left = None
+        if cooldown > 0 and not results[1] and results[2] > 0:
+            cooldown_left = results[2] / 1000
+        return ConfessCheck(banned_until, cooldown_left)
+
+    async def get_ban(self, user_id: str, server_id: int) -> Optional[float]:
+        timeout = await self._redis.get(self._key("ban", server_id, user_id))
+        if timeout is None or float(timeout) <= time.time():
+            return None
+        return float(timeout)
+
+    async def set_bans(self, bans: Iterable[Tuple[str, int, float]]):
+        pipe = self._redis.pipeline(transaction=False)
+        for user_id, server_id, timeout in bans:
+            key = self._key("ban", server_id, user_id)
+            pipe.set(key, timeout)
+            pipe.expireat(key, int(timeout) + 1)
+        await pipe.execute()
+
+    async def remove_ban(self, user_id: str, server_id: int):
+        await self._redis.delete(self._key("ban", server_id, user_id))
+
+    async def expire_bans(self, now: float):
+        # Ban keys expire by themselves.
+        pass
+
+    async def seed_votes(self, server_id: int, message_id: int, count: int) -> int:
+        key = self._key("votes", server_id, message_id)
+        return int(await self._seed_votes(keys=[key], args=[max(count, 0), VOTE_TTL]))
+
+    async def add_vote(
+        self, server_id: int, message_id: int, amount: int = 1
+    ) -> Optional[int]:
+        key = self._key("votes", server_id, message_id)
+        count = await self._add_vote(keys=[key], args=[amount, VOTE_TTL])
+        return None if count is None else int(count)
+
+    async def claim(self, server_id: int, message_id: int) -> bool:
+        key = self._key("claim", server_id, message_id)
+        return bool(await self._redis.set(key, 1, ex=CLAIM_TTL, nx=True))
+
+    async def release(self, server_id: int, message_id: int):
+        await self._redis.delete(self._key("claim", server_id, message_id))
+
+    async def forget(self, server_id: int, message_id: int):
+        await self._redis.delete(
+            self._key("votes", server_id, message_id),
+            self._key("claim", server_id, message_id),
+        )
+
+
+def create_state_store() -> StateStore:
+    if config.state_store_url:
+        return RedisStateStore(config.state_store_url)
+    return LocalStateStore()
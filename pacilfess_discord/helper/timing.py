@@ -0,0 +1,28 @@
+import logging
+import time
+from typing import List, Tuple
+
+logger = logging.getLogger("pacilfess_discord.timing")
+
+
+class StageTimer:
+    """Measures how long each stage of a command takes and logs it."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages: List[Tuple[str, float]] = []
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        """Ends the current stage, naming it `stage`."""
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self._start
+
+    def log(self):
+        stages = ", ".join(f"{stage} {t * 1000:.1f}ms" for stage, t in self.stages)
+        logger.info("%s took %.1fms (%s)", self.name, self.total * 1000, stages)
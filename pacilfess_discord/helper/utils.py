@@ -1,11 +1,12 @@
-from datetime import datetime
+from typing import TYPE_CHECKING, cast
 
 import discord
 from discord.ext import commands
 from discord.ext.commands.context import Context
 from discord_slash.context import SlashContext
 
-from pacilfess_discord.models import BannedUser, ServerConfig
+if TYPE_CHECKING:
+    from pacilfess_discord.bot import Fess
 
 
 class NoConfig(commands.CheckFailure):
@@ -16,21 +17,6 @@ class Forbidden(commands.CheckFailure):
     pass
 
 
-async def check_banned(user_id: str, server_id: int):
-    current_time = datetime.now()
-
-    existing_ban = await BannedUser.objects.get_or_none(
-        user_id=user_id, server_id=server_id
-    )
-    if existing_ban:
-        if current_time < existing_ban.datetime:
-            return existing_ban
-        else:
-            await existing_ban.delete()
-
-    return None
-
-
 def owner_or_admin():
     original = commands.has_permissions(manage_guild=True).predicate
 
@@ -46,7 +32,8 @@ async def is_admin(ctx: SlashContext):
     if not ctx.guild_id:
         raise commands.NoPrivateMessage()
 
-    server_conf = await ServerConfig.objects.get_or_none(server_id=ctx.guild_id)
+    bot = cast("Fess", ctx.bot)
+    server_conf = await bot.config_cache.get(ctx.guild_id)
     if not server_conf:
         raise NoConfig()
 
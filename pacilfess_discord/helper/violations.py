@@ -0,0 +1,71 @@
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+import sqlalchemy
+
+from pacilfess_discord.helper.database import database
+from pacilfess_discord.helper.writer import writer
+from pacilfess_discord.models import Violation
+
+WINDOW = timedelta(weeks=4).total_seconds()
+
+ScoreKey = Tuple[str, int]
+
+
+class ViolationScores:
+    """Rolling sum of violation severity per user over the last 4 weeks.
+
+    Each entry keeps the total and the oldest timestamp counted in it. The
+    total stays valid until that oldest violation leaves the window, after
+    which it is recomputed with a single SUM() query."""
+
+    def __init__(self):
+        self._scores: Dict[ScoreKey, Tuple[int, Optional[float]]] = {}
+
+    async def _query(self, user_id: str, server_id: int, since: float):
+        table = Violation.Meta.table
+        query = sqlalchemy.select(
+            [
+                sqlalchemy.func.sum(table.c.severity),
+                sqlalchemy.func.min(table.c.timestamp),
+            ]
+        ).where(
+            sqlalchemy.and_(
+                table.c.user_id == user_id,
+                table.c.server_id == server_id,
+                table.c.timestamp >= int(since),
+            )
+        )
+        row = await database.fetch_one(query)
+        if row is None or row[0] is None:
+            return 0, None
+        return int(row[0]), row[1]
+
+    async def total(self, user_id: str, server_id: int, now: float) -> int:
+        key = (user_id, server_id)
+        entry = self._scores.get(key)
+        if entry is not None:
+            total, oldest = entry
+            if oldest is None or oldest >= now - WINDOW:
+                return total
+
+        total, oldest = await self._query(user_id, server_id, now - WINDOW)
+        self._scores[key] = (total, oldest)
+        return total
+
+    async def add(self, user_id: str, server_id: int, severity: int, timestamp: float):
+        """Stores a new violation and adds it to the cached score."""
+        await writer.submit(
+            lambda: Violation.objects.create(
+                user_id=user_id,
+                server_id=server_id,
+                severity=severity,
+                timestamp=timestamp,
+            )
+        )
+
+        key = (user_id, server_id)
+        entry = self._scores.get(key)
+        if entry is not None:
+            total, oldest = entry
+            self._scores[key] = (total + severity, oldest or timestamp)
@@ -0,0 +1,89 @@
+import asyncio
+import sys
+import traceback
+from typing import Awaitable, Callable, Dict, Tuple
+
+from pacilfess_discord.helper.state import StateStore
+
+MessageKey = Tuple[int, int]
+
+
+class VoteCounter:
+    """Keeps deletion vote counts per confession from gateway events.
+
+    A message is seeded once, either when the bot sends it or lazily from a
+    single fetch, and is then only updated from reaction add/remove events.
+    The counts live in the state store so every bot process sees the same.
+
+    Only one evaluation runs per message at a time. Votes arriving while it
+    runs are added up and picked up by that evaluation, so a burst of
+    reactions costs one store call per round instead of one per reaction."""
+
+    def __init__(self, store: StateStore):
+        self.store = store
+        # Messages being evaluated -> votes not counted yet.
+        self._pending: Dict[MessageKey, int] = {}
+
+    @staticmethod
+    def _report(task: "asyncio.Future[int]"):
+        exc = None if task.cancelled() else task.exception()
+        if exc is not None:
+            traceback.print_exception(
+                type(exc), exc, exc.__traceback__, file=sys.stderr
+            )
+
+    def seed(self, server_id: int, message_id: int, count: int = 0):
+        """Seeds a new message in the background, nothing waits on it."""
+        task = asyncio.ensure_future(
+            self.store.seed_votes(server_id, message_id, count)
+        )
+        task.add_done_callback(self._report)
+
+    async def count(
+        self,
+        server_id: int,
+        message_id: int,
+        amount: int,
+        fetch: Callable[[], Awaitable[int]],
+        on_count: Callable[[int], Awaitable[bool]],
+    ):
+        """Counts `amount` votes and calls `on_count` with the new total.
+
+        Returns right away if the message is already being evaluated, the
+        running evaluation counts these votes too. `on_count` returns True
+        once the message is done with, e.g. deleted, which ends the
+        evaluation. `fetch` is only called when the message has not been seen
+        yet, the count it returns must already include these votes. Votes
+        arriving while it is in flight are assumed to be included as well."""
+        key = (server_id, message_id)
+        if key in self._pending:
+            self._pending[key] += amount
+            return
+
+        self._pending[key] = amount
+        try:
+            while self._pending[key]:
+                amount = self._pending[key]
+                self._pending[key] = 0
+
+                total = await self.store.add_vote(server_id, message_id, amount)
+                if total is None:
+                    total = await self.store.seed_votes(
+                        server_id, message_id, await fetch()
+                    )
+                    self._pending[key] = 0
+
+                if await on_count(total):
+                    return
+        finally:
+            del self._pending[key]
+
+    async def claim(self, server_id: int, message_id: int) -> bool:
+        """Marks a message as being deleted, returns False if already taken."""
+        return await self.store.claim(server_id, message_id)
+
+    async def release(self, server_id: int, message_id: int):
+        await self.store.release(server_id, message_id)
+
+    async def forget(self, server_id: int, message_id: int):
+        await self.store.forget(server_id, message_id)
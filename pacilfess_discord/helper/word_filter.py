@@ -0,0 +1,151 @@
+import re
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Pattern
+
+if sys.version_info >= (3, 11):
+    from re import _constants as sre_constants, _parser as sre_parse
+else:
+    import sre_constants
+    import sre_parse
+
+MAX_TERM_LENGTH = 100
+MAX_ENTRIES = 10000
+
+# Nested to any depth, mypy cannot express the recursion.
+Trie = Dict[str, Any]
+
+
+def normalize(text: str) -> str:
+    """Casefolds a text and collapses its whitespace, before any matching."""
+    return " ".join(text.casefold().split())
+
+
+def _trie_pattern(node: Trie) -> str:
+    # "" marks the end of a term.
+    branches = [
+        re.escape(char) + _trie_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+    if not branches:
+        return ""
+    if len(branches) == 1 and "" not in node:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")" + ("?" if "" in node else "")
+
+
+def compile_terms(terms: Iterable[str]) -> Optional[Pattern[str]]:
+    """One regex matching any of the terms as whole words.
+
+    The terms are merged into a trie first, so the regex engine follows
+    shared prefixes once instead of trying every term at every position.
+    Matches against casefolded text with whitespace collapsed, see
+    normalize()."""
+    trie: Trie = {}
+    for term in terms:
+        term = normalize(term)
+        # An empty term would match everywhere.
+        if not term:
+            continue
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    if not trie:
+        return None
+    return re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)")
+
+
+class WordFilter:
+    """Compiled blocked terms and regex patterns of one guild.
+
+    Terms become a single trie regex and patterns are merged into one
+    alternation, unless they cannot be merged safely. Both run on the
+    normalized text, patterns are not compiled with IGNORECASE as that makes
+    a long alternation many times slower. Building one for thousands of
+    terms takes a while, it is meant to be built once per change of the
+    list."""
+
+    def __init__(self, terms: Iterable[str], patterns: Iterable[str]):
+        self.terms = compile_terms(terms)
+
+        # Patterns stored before validate_pattern() looked for catastrophic
+        # backtracking are left out, they can still be listed and removed.
+        merged = [x for x in patterns if validate_pattern(x) is None]
+        self.patterns: List[Pattern[str]] = []
+        if not merged:
+            return
+
+        try:
+            combined = "|".join(f"(?:{pattern})" for pattern in merged)
+            self.patterns = [re.compile(combined)]
+        except re.error:
+            # E.g. the same group name twice, or inline flags.
+            self.patterns = [re.compile(x) for x in merged]
+
+    def search(self, text: str) -> Optional[str]:
+        """Returns the first blocked part of the text, or None."""
+        text = normalize(text)
+        if self.terms is not None:
+            match = self.terms.search(text)
+            if match:
+                return match.group()
+
+        for pattern in self.patterns:
+            match = pattern.search(text)
+            if match:
+                return match.group()
+        return None
+
+
+def _subpatterns(value: Any) -> Iterator[Any]:
+    # The arguments of a node hold its children at different places
+    # depending on the node and the Python version.
+    if isinstance(value, sre_parse.SubPattern):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _subpatterns(item)
+
+
+def _backtracking(parsed: Any, repeated: bool = False) -> Optional[str]:
+    """Returns why a parsed pattern can backtrack catastrophically, or None.
+
+    The regex runs on the event loop and cannot be interrupted, so anything
+    that lets it try exponentially many ways to match a text, like (a+)+$,
+    is refused up front. This is stricter than needed, some nested
+    quantifiers are harmless."""
+    for op, value in parsed:
+        if op in (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+            return "Patterns cannot use backreferences."
+        if op == sre_constants.BRANCH and repeated:
+            return "Patterns cannot repeat an alternation."
+
+        inner = repeated
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, high, _ = value
+            if repeated and high != low:
+                return "Patterns cannot repeat something that is repeated already."
+            inner = repeated or high > 1
+
+        for child in _subpatterns(value):
+            error = _backtracking(child, inner)
+            if error:
+                return error
+    return None
+
+
+def validate_pattern(pattern: str) -> Optional[str]:
+    """Returns why a regex pattern cannot be used, or None if it can."""
+    if len(pattern) > MAX_TERM_LENGTH:
+        return f"Patterns can be at most {MAX_TERM_LENGTH} characters."
+    try:
+        compiled = re.compile(pattern)
+    except re.error as exc:
+        return f"Invalid pattern: {exc}."
+    # It would block everything, and hide the other patterns when merged.
+    if compiled.match(""):
+        return "Patterns cannot match an empty text."
+    # Backreferences would also point at the wrong group once merged.
+    return _backtracking(sre_parse.parse(pattern))
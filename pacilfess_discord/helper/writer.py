@@ -0,0 +1,107 @@
+import asyncio
+import contextvars
+import sys
+import traceback
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from pacilfess_discord.helper.database import database, is_sqlite
+
+T = TypeVar("T")
+
+Write = Callable[[], Awaitable[Any]]
+QueuedWrite = Tuple[Write, "asyncio.Future[Any]"]
+
+
+class DatabaseWriter:
+    """Runs every insert, update and delete from a single task.
+
+    SQLite only allows one writer at a time, so instead of every command
+    fighting for the lock, writes are queued here and whatever is queued is
+    committed together in one transaction. Each write runs in a savepoint so
+    a failing one does not take the rest of the batch down with it.
+
+    When not started (or not on SQLite), writes simply run in place."""
+
+    def __init__(self, max_batch: int = 100):
+        self.max_batch = max_batch
+        self._queue: "Optional[asyncio.Queue[Optional[QueuedWrite]]]" = None
+        self._task: "Optional[asyncio.Task[None]]" = None
+
+    async def submit(self, write: Callable[[], Awaitable[T]]) -> T:
+        if self._queue is None:
+            return await write()
+
+        future = asyncio.get_event_loop().create_future()
+        self._queue.put_nowait((write, future))
+        return await future
+
+    async def _run_batch(self, batch: List[QueuedWrite]):
+        results: List[Tuple["asyncio.Future[Any]", Any, Optional[BaseException]]] = []
+        try:
+            async with database.transaction():
+                for write, future in batch:
+                    try:
+                        async with database.transaction():
+                            results.append((future, await write(), None))
+                    except Exception as exc:
+                        results.append((future, None, exc))
+        except Exception as commit_exc:
+            # The commit itself failed, nothing in this batch was written.
+            results = [(future, None, commit_exc) for _, future in batch]
+
+        # Only answer after the commit, so callers never read stale data.
+        for future, result, error in results:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def _run(self):
+        assert self._queue is not None
+        running = True
+        while running:
+            batch: List[QueuedWrite] = []
+            item = await self._queue.get()
+            while True:
+                if item is None:
+                    running = False
+                else:
+                    batch.append(item)
+
+                if len(batch) >= self.max_batch or self._queue.empty():
+                    break
+                item = self._queue.get_nowait()
+
+            if not batch:
+                continue
+
+            try:
+                await self._run_batch(batch)
+            except Exception as exc:
+                traceback.print_exception(
+                    type(exc), exc, exc.__traceback__, file=sys.stderr
+                )
+
+    def start(self):
+        if not is_sqlite or self._task is not None:
+            return
+
+        self._queue = asyncio.Queue()
+        # Run in a fresh context so the writer gets a connection of its own
+        # instead of sharing the one of whoever started it.
+        self._task = contextvars.Context().run(asyncio.ensure_future, self._run())
+
+    async def stop(self):
+        """Flushes everything still queued, then stops the writer."""
+        if self._queue is None or self._task is None:
+            return
+
+        self._queue.put_nowait(None)
+        await self._task
+        self._queue = None
+        self._task = None
+
+
+writer = DatabaseWriter()
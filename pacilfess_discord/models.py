@@ -3,6 +3,7 @@ from datetime import datetime
 from typing import List, Optional
 
 import ormar
+import sqlalchemy
 from dataclasses_json import DataClassJsonMixin
 from pydantic import Json
 
@@ -20,8 +21,9 @@ class Confess(ormar.Model):
         tablename = "confessions"
 
     id: int = ormar.Integer(primary_key=True)
-    server_id: int = ormar.Integer()
-    message_id: int = ormar.Integer()
+    server_id: int = ormar.BigInteger()
+    message_id: int = ormar.BigInteger()
+    channel_id: Optional[int] = ormar.BigInteger(nullable=True)
     user_id: str = ormar.Text()
 
     content: str = ormar.Text()
@@ -33,13 +35,27 @@ class Confess(ormar.Model):
         return datetime.fromtimestamp(self.sendtime)
 
 
+sqlalchemy.Index(
+    "uq_confessions_server_message",
+    Confess.Meta.table.c.server_id,
+    Confess.Meta.table.c.message_id,
+    unique=True,
+)
+sqlalchemy.Index(
+    "ix_confessions_server_user_sendtime",
+    Confess.Meta.table.c.server_id,
+    Confess.Meta.table.c.user_id,
+    Confess.Meta.table.c.sendtime,
+)
+
+
 class BannedUser(ormar.Model):
     class Meta(BaseMeta):
         tablename = "banned_users"
 
     id: int = ormar.Integer(primary_key=True)
     user_id: str = ormar.Text()
-    server_id: int = ormar.Integer()
+    server_id: int = ormar.BigInteger()
 
     timeout: int = ormar.Integer()
 
@@ -48,13 +64,21 @@ class BannedUser(ormar.Model):
         return datetime.fromtimestamp(self.timeout)
 
 
+sqlalchemy.Index(
+    "uq_banned_users_user_server",
+    BannedUser.Meta.table.c.user_id,
+    BannedUser.Meta.table.c.server_id,
+    unique=True,
+)
+
+
 class Violation(ormar.Model):
     class Meta(BaseMeta):
         tablename = "violations"
 
     id: int = ormar.Integer(primary_key=True)
     user_id: str = ormar.Text()
-    server_id: int = ormar.Integer()
+    server_id: int = ormar.BigInteger()
 
     severity: int = ormar.Integer()
     timestamp: int = ormar.Integer()
@@ -64,18 +88,51 @@ class Violation(ormar.Model):
         return datetime.fromtimestamp(self.timestamp)
 
 
+sqlalchemy.Index(
+    "ix_violations_user_server_timestamp",
+    Violation.Meta.table.c.user_id,
+    Violation.Meta.table.c.server_id,
+    Violation.Meta.table.c.timestamp,
+)
+
+
 class ServerConfig(ormar.Model):
     class Meta(BaseMeta):
         tablename = "server_configs"
 
-    server_id: int = ormar.Integer(primary_key=True)
-    votelog_channel: Optional[int] = ormar.Integer(nullable=True)
-    confession_channel: Optional[int] = ormar.Integer(nullable=True)
+    server_id: int = ormar.BigInteger(primary_key=True)
+    votelog_channel: Optional[int] = ormar.BigInteger(nullable=True)
+    confession_channel: Optional[int] = ormar.BigInteger(nullable=True)
     admin_roles: Json[List[int]] = ormar.JSON(default="[]")
     minimum_vote: int = ormar.Integer(default=config.default_vote)
     cooldown_time: int = ormar.Integer(default=0)
 
 
+class FilterPattern(ormar.Model):
+    class Meta(BaseMeta):
+        tablename = "filter_patterns"
+
+    id: int = ormar.Integer(primary_key=True)
+    server: Optional[ServerConfig] = ormar.ForeignKey(
+        ServerConfig,
+        name="server_id",
+        related_name="filters",
+        nullable=False,
+        ondelete="CASCADE",
+    )
+    pattern: str = ormar.Text()
+    is_regex: bool = ormar.Boolean(default=False)
+
+
+sqlalchemy.Index(
+    "uq_filter_patterns_server_pattern",
+    FilterPattern.Meta.table.c.server_id,
+    FilterPattern.Meta.table.c.pattern,
+    FilterPattern.Meta.table.c.is_regex,
+    unique=True,
+)
+
+
 @dataclass
 class DeletedData(DataClassJsonMixin):
     uid: str